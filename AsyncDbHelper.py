@@ -0,0 +1,141 @@
+import itertools
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiomysql
+
+from DbHelper import _chunked, _row_getter
+from SysConfig import SysConfig
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDbHelper:
+    """
+    Asyncio mirror of DbHelper built on aiomysql
+
+    Lets callers pipeline independent batch operations instead of
+    serializing them on one blocking socket:
+
+        await asyncio.gather(
+            db.insert_batch_async(TableNames.CAMERA, cams),
+            db.update_batch_async(TableNames.ACTION, actions)
+        )
+
+    The synchronous DbHelper stays the primary API.
+    """
+
+    def __init__(self, host="192.168.1.22", port=3306, user="root", password="root",
+                 database="testuse_config"):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.database = database
+        self._pool = None
+        self.logger = logger
+
+    def update_by_sys_config(self, sys_config: SysConfig):
+        self.host = sys_config.db_host
+        self.port = int(sys_config.db_port or 3306)
+        self.user = sys_config.db_user
+        self.password = sys_config.db_password
+        self.database = sys_config.db_name
+        # Force the pool to be rebuilt with the new credentials
+        self._pool = None
+
+    async def _get_pool(self) -> aiomysql.Pool:
+        if self._pool is None:
+            self._pool = await aiomysql.create_pool(
+                host=self.host,
+                port=self.port,
+                user=self.user,
+                password=self.password,
+                db=self.database,
+                autocommit=True,
+                maxsize=16
+            )
+            self.logger.info("Async database connection pool created")
+        return self._pool
+
+    async def execute_query_dict_async(self, query: str,
+                                       params: Optional[Tuple] = None) -> List[Dict]:
+        """Execute SELECT query and return results as list of dictionaries"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params)
+                return list(await cursor.fetchall())
+
+    async def insert_batch_async(self, table: str, data_list: List[Dict[str, Any]],
+                                 batch_size: int = 1000) -> int:
+        """Insert multiple records using multi-row VALUES, one RTT per chunk"""
+        if not data_list:
+            return 0
+
+        all_columns = list(data_list[0].keys())
+        columns = ", ".join(all_columns)
+        row_placeholders = "(" + ", ".join(["%s"] * len(all_columns)) + ")"
+        getter = _row_getter(all_columns)
+
+        pool = await self._get_pool()
+        affected_rows = 0
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for chunk in _chunked(data_list, batch_size):
+                    query = (f"INSERT INTO {table} ({columns}) VALUES "
+                             + ", ".join([row_placeholders] * len(chunk)))
+                    flat_values = list(itertools.chain.from_iterable(
+                        getter(record) for record in chunk))
+                    await cursor.execute(query, flat_values)
+                    affected_rows += cursor.rowcount
+
+        self.logger.info(f"Async batch insert completed. {affected_rows} records inserted")
+        return affected_rows
+
+    async def update_batch_async(self, table: str, data_list: List[Dict[str, Any]],
+                                 id_column: str = "id", batch_size: int = 500) -> int:
+        """Update multiple records with one CASE WHEN statement per chunk"""
+        if not data_list:
+            return 0
+
+        # Group rows by their non-id column set
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for data in data_list:
+            if id_column not in data:
+                raise ValueError(f"ID column '{id_column}' not found in data")
+            cols = tuple(key for key in data.keys() if key != id_column)
+            groups.setdefault(cols, []).append(data)
+
+        pool = await self._get_pool()
+        total_affected = 0
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for cols, rows in groups.items():
+                    if not cols:
+                        continue
+                    for chunk in _chunked(rows, batch_size):
+                        ids = [row[id_column] for row in chunk]
+                        set_parts = []
+                        params: List[Any] = []
+                        for col in cols:
+                            whens = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                            set_parts.append(f"{col} = CASE {id_column} {whens} END")
+                            for row in chunk:
+                                params.extend((row[id_column], row[col]))
+                        placeholders = ", ".join(["%s"] * len(chunk))
+                        query = (f"UPDATE {table} SET " + ", ".join(set_parts)
+                                 + f" WHERE {id_column} IN ({placeholders})")
+                        await cursor.execute(query, params + ids)
+                        total_affected += cursor.rowcount
+
+        self.logger.info(f"Async batch update completed. {total_affected} rows affected")
+        return total_affected
+
+    async def close(self):
+        """Dispose of the connection pool"""
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+            self.logger.info("Async database connection pool closed")
@@ -1,10 +1,106 @@
+import itertools
+import operator
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import InterfaceError, OperationalError
+from mysql.connector.constants import ClientFlag
+from mysql.connector.pooling import MySQLConnectionPool, PooledMySQLConnection
 from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
 
 from SysConfig import SysConfig
 
+# Global logging side effect belongs at import, not per DbHelper instance
+logging.basicConfig(level=logging.INFO)
+
+
+def _chunked(items: List, size: int):
+    """Yield successive slices of at most `size` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _row_getter(columns: List[str]):
+    """C-implemented value extraction in a fixed column order
+
+    Safer than tuple(row.values()) for rows whose keys were inserted in
+    a different order, and about twice as fast
+    """
+    getter = operator.itemgetter(*columns)
+    if len(columns) == 1:
+        return lambda row: (getter(row),)
+    return getter
+
+
+def _load_data_field(value: Any) -> str:
+    """Render one field for a LOAD DATA spool file
+
+    MySQL's default FIELDS/LINES handling understands backslash escapes
+    but no quoting, so backslash, tab, newline and CR must be escaped by
+    hand — csv-style quoting would be ingested as literal quote chars
+    """
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _write_load_data_rows(tmp, data_list: List[Dict[str, Any]], getter):
+    for record in data_list:
+        tmp.write('\t'.join(_load_data_field(value)
+                            for value in getter(record)) + '\n')
+
+
+@lru_cache(maxsize=256)
+def _build_select_by_id_sql(table: str, id_column: str) -> str:
+    return f"SELECT * FROM {table} WHERE {id_column} = %s"
+
+
+@lru_cache(maxsize=1024)
+def _build_select_sql(table: str, conditions: Optional[str],
+                      order_clause: Optional[str], limit_form: Optional[str]) -> str:
+    """Assemble (and cache) the final SELECT template for a call shape"""
+    query = f"SELECT * FROM {table}"
+    if conditions:
+        query += f" WHERE {conditions}"
+    if order_clause:
+        query += f" ORDER BY {order_clause}"
+    if limit_form:
+        query += f" {limit_form}"
+    return query
+
+
+@lru_cache(maxsize=256)
+def _build_count_sql(table: str, conditions: Optional[str]) -> str:
+    query = f"SELECT COUNT(*) FROM {table}"
+    if conditions:
+        query += f" WHERE {conditions}"
+    return query
+
+
+# Sentinel: a column set to NOW renders as server-side CURRENT_TIMESTAMP
+# instead of a Python datetime built and serialized client-side
+NOW = object()
+
+
+def _build_set_clause(data: Dict[str, Any]):
+    """SET fragment plus bind params, rendering the NOW sentinel in SQL"""
+    clauses = []
+    params = []
+    for key, value in data.items():
+        if value is NOW:
+            clauses.append(f"{key} = CURRENT_TIMESTAMP")
+        else:
+            clauses.append(f"{key} = %s")
+            params.append(value)
+    return ", ".join(clauses), params
+
 class TableNames:
     ACTION = "xcam_actions"
     CAMERA = "xcam_cameras"
@@ -46,19 +142,23 @@ class DbHelper:
     Including batch operations for better performance
     """
 
-    def __init__(self, host="192.168.1.22", user="root", password="root", database="testuse_config"):
+    def __init__(self, host="192.168.1.22", user="root", password="root", database="testuse_config",
+                 cache_ttl_seconds: float = 0):
         """
         Initialize database connection parameters
+        cache_ttl_seconds > 0 enables a small in-process cache on
+        idempotent lookups for callers that tolerate short staleness
         """
         self.host = host
         self.user = user
         self.password = password
         self.database = database
-        self.connection = None
-        self.cursor = None
+        self._pool = None
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+        self._table_generations: Dict[str, int] = {}
 
         # Setup logging
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
     def update_by_sys_config(self, sys_config: SysConfig):
@@ -66,84 +166,148 @@ class DbHelper:
         self.user = sys_config.db_user
         self.password = sys_config.db_password
         self.database = sys_config.db_name
+        # Force the pool to be rebuilt with the new credentials
+        self._pool = None
 
-    def get_connection(self) -> mysql.connector.MySQLConnection:
+    def _create_pool(self) -> MySQLConnectionPool:
         """
-        Create and return database connection with better connection handling
+        Build the connection pool, preferring the C-extension driver which
+        rewrites executemany into a single multi-row INSERT
+
+        FOUND_ROWS changes rowcount semantics helper-wide: UPDATE (and
+        the upsert paths) report matched rows instead of changed rows,
+        which keeps the upsert insert/update accounting exact when a row
+        is re-upserted with identical values
         """
+        kwargs = dict(
+            pool_name="xcam",
+            pool_size=8,
+            pool_reset_session=True,
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            autocommit=True,  # Enable autocommit for SELECT queries
+            connection_timeout=10,
+            consume_results=True,
+            allow_local_infile=True,  # Needed for load_data()
+            client_flags=[ClientFlag.FOUND_ROWS]
+        )
         try:
-            # Always check if connection is still valid
-            if self.connection is None or not self.connection.is_connected():
-                if self.connection:
-                    try:
-                        self.connection.close()
-                    except:
-                        pass
-                        
-                self.connection = mysql.connector.connect(
-                    host=self.host,
-                    user=self.user,
-                    password=self.password,
-                    database=self.database,
-                    autocommit=True,  # Enable autocommit for SELECT queries
-                    connection_timeout=10,
-                    pool_reset_session=True
-                )
-                self.logger.info("Database connection established")
-            else:
-                # Test connection with ping
-                try:
-                    self.connection.ping(reconnect=True, attempts=3, delay=1)
-                except:
-                    # If ping fails, create new connection
-                    self.connection = mysql.connector.connect(
-                        host=self.host,
-                        user=self.user,
-                        password=self.password,
-                        database=self.database,
-                        autocommit=True,
-                        connection_timeout=10,
-                        pool_reset_session=True
-                    )
-                    self.logger.info("Database connection reconnected")
-                    
-            return self.connection
+            return MySQLConnectionPool(use_pure=False, **kwargs)
+        except ImportError:
+            # C extension not installed, fall back to the pure-Python driver
+            return MySQLConnectionPool(**kwargs)
+
+    def get_connection(self) -> PooledMySQLConnection:
+        """
+        Check out a connection from the pool (created lazily); callers
+        return it by calling close(), which all helper methods do in
+        their finally blocks
+        """
+        try:
+            if self._pool is None:
+                self._pool = self._create_pool()
+                self.logger.info("Database connection pool created")
+            return self._pool.get_connection()
         except Error as e:
             self.logger.error(f"Error connecting to database: {e}")
             raise
 
     def close_connection(self):
         """
-        Close database connection and cursor
+        Dispose of the connection pool
         """
         try:
-            if self.cursor:
-                self.cursor.close()
-                self.cursor = None
-            if self.connection and self.connection.is_connected():
-                self.connection.close()
-                self.connection = None
-                self.logger.info("Database connection closed")
+            if self._pool is not None:
+                self._pool._remove_connections()
+                self.logger.info("Database connection pool closed")
         except Error as e:
-            self.logger.error(f"Error closing connection: {e}")
+            self.logger.error(f"Error closing connection pool: {e}")
+        finally:
+            self._pool = None
 
     def __enter__(self):
         """Context manager entry"""
-        self.get_connection()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit"""
         self.close_connection()
 
-    def execute_query(self, query: str, params: Optional[Tuple] = None) -> List[Tuple]:
+    @contextmanager
+    def transaction(self):
+        """
+        Group several batch calls into a single transaction:
+
+            with db.transaction() as conn:
+                db.insert_batch(..., conn=conn)
+                db.update_batch(..., conn=conn)
+
+        Commits on success, rolls back on exception
+        """
+        conn = self.get_connection()
+        # start_transaction() is a delegated method call and reaches the
+        # real connection; assigning conn.autocommit on the pooled
+        # wrapper would not, leaving every statement to self-commit
+        conn.start_transaction()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()  # Return connection to the pool
+
+    def _invalidate_table(self, table: str):
+        """Bump the table's generation so stale cache entries never match"""
+        self._table_generations[table] = self._table_generations.get(table, 0) + 1
+
+    def _cached_read(self, table: str, key: Tuple, loader):
+        """Serve an idempotent lookup from the TTL cache when enabled"""
+        if self.cache_ttl_seconds <= 0:
+            return loader()
+
+        full_key = (table, self._table_generations.get(table, 0)) + key
+        hit = self._cache.get(full_key)
+        now = time.monotonic()
+        if hit is not None and now - hit[0] < self.cache_ttl_seconds:
+            return hit[1]
+
+        value = loader()
+        if len(self._cache) > 1024:
+            self._cache.clear()
+        self._cache[full_key] = (now, value)
+        return value
+
+    def _with_retry(self, fn):
+        """
+        Run fn, retrying once on a dropped connection; the pool hands out
+        a fresh socket on the second attempt
+        """
+        try:
+            return fn()
+        except (OperationalError, InterfaceError) as e:
+            self.logger.warning(f"Connection error, retrying once: {e}")
+            return fn()
+
+    def execute_query(self, query: str, params: Optional[Tuple] = None,
+                      prepared: bool = False) -> List[Tuple]:
         """
         Execute SELECT query and return results with better error handling
+        Prepared statements let the server reuse its parse/plan for
+        repeated query templates
         """
+        return self._with_retry(lambda: self._execute_query_once(query, params, prepared))
+
+    def _execute_query_once(self, query: str, params: Optional[Tuple] = None,
+                            prepared: bool = False) -> List[Tuple]:
+        conn = None
         cursor = None
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
+            cursor = conn.cursor(prepared=True) if prepared else conn.cursor()
 
             if params:
                 cursor.execute(query, params)
@@ -151,7 +315,8 @@ class DbHelper:
                 cursor.execute(query)
 
             results = cursor.fetchall()
-            self.logger.debug(f"Query executed successfully. Returned {len(results)} rows")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Query executed successfully. Returned %d rows", len(results))
             return results
 
         except Error as e:
@@ -163,26 +328,35 @@ class DbHelper:
         finally:
             if cursor:
                 cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
 
-    def execute_query_dict(self, query: str, params: Optional[Tuple] = None) -> List[Dict]:
+    def execute_query_dict(self, query: str, params: Optional[Tuple] = None,
+                           prepared: bool = False) -> List[Dict]:
         """
         Execute SELECT query and return results as list of dictionaries with better connection handling
         """
+        return self._with_retry(lambda: self._execute_query_dict_once(query, params, prepared))
+
+    def _execute_query_dict_once(self, query: str, params: Optional[Tuple] = None,
+                                 prepared: bool = False) -> List[Dict]:
+        conn = None
         cursor = None
         try:
             conn = self.get_connection()
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor(prepared=True) if prepared else conn.cursor()
 
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
 
-            results = cursor.fetchall()
-            self.logger.debug(f"Query executed successfully. Returned {len(results)} rows")
-            self.logger.debug(f"Query: {query}")
-            if params:
-                self.logger.debug(f"Params: {params}")
+            # Plain tuple cursor + one zip per row is cheaper than the
+            # dictionary cursor's per-row dict building in the driver
+            cols = cursor.column_names
+            results = [dict(zip(cols, row)) for row in cursor.fetchall()]
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Query executed successfully. Returned %d rows", len(results))
             return results
 
         except Error as e:
@@ -194,43 +368,86 @@ class DbHelper:
         finally:
             if cursor:
                 cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
+
+    def iter_query_dict(self, query: str, params: Optional[Tuple] = None, arraysize: int = 1000):
+        """
+        Stream a SELECT as dictionaries without materializing the whole
+        result set; rows arrive in fetchmany batches over an unbuffered
+        cursor so memory stays O(arraysize)
+        """
+        conn = None
+        cursor = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True, buffered=False)
+
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+
+            while True:
+                rows = cursor.fetchmany(arraysize)
+                if not rows:
+                    break
+                yield from rows
+
+        except Error as e:
+            self.logger.error(f"Error streaming query: {e}")
+            self.logger.error(f"Query: {query}")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
 
     def select_all(self, table: str,
                    conditions: Optional[str] = None,
                    params: Optional[Tuple] = None,
                    offset=None,
-                   limit=None
-                   ) -> List[Dict]:
+                   limit=None,
+                   stream: bool = False
+                   ):
         """
         Select all records from table with optional conditions
+        With stream=True an iterator is returned instead of a list
         """
-        query = f"SELECT * FROM {table}"
-        if conditions:
-            query += f" WHERE {conditions}"
-
+        limit_form = None
         if limit and offset:
-            query += f" LIMIT {offset}, {limit}"
+            limit_form = f"LIMIT {offset}, {limit}"
         elif limit:
-            query += f" LIMIT {limit}"
+            limit_form = f"LIMIT {limit}"
 
+        query = _build_select_sql(table, conditions, None, limit_form)
+
+        if stream:
+            return self.iter_query_dict(query, params)
         return self.execute_query_dict(query, params)
 
     def select_by_id(self, table: str, id_value: Any, id_column: str = "id") -> Optional[Dict]:
         """
         Select single record by ID
         """
-        query = f"SELECT * FROM {table} WHERE {id_column} = %s"
-        results = self.execute_query_dict(query, (id_value,))
-        return results[0] if results else None
+        def _load():
+            query = _build_select_by_id_sql(table, id_column)
+            results = self.execute_query_dict(query, (id_value,), prepared=True)
+            return results[0] if results else None
+
+        return self._cached_read(table, ('by_id', id_column, id_value), _load)
 
     def insert_one(self, table: str, data: Dict[str, Any]) -> int:
         """
         Insert single record into table with transaction control
         """
+        conn = None
         cursor = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
             columns = ", ".join(data.keys())
             placeholders = ", ".join(["%s"] * len(data))
@@ -241,99 +458,263 @@ class DbHelper:
                 conn.commit()
 
             last_id = cursor.lastrowid
-            self.logger.info(f"Record inserted successfully. ID: {last_id}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Record inserted successfully. ID: %s", last_id)
             return last_id
 
         except Error as e:
-            if not conn.autocommit:
+            if conn and not conn.autocommit:
                 conn.rollback()
             self.logger.error(f"Error inserting record: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
 
-    def insert_batch(self, table: str, data_list: List[Dict[str, Any]]) -> int:
+    def insert_batch(self, table: str, data_list: List[Dict[str, Any]], batch_size: int = 1000,
+                     conn=None) -> int:
         """
-        Insert multiple records in batch
+        Insert multiple records in batch using multi-row VALUES
+        One round-trip per chunk instead of one per row
+        Pass conn from transaction() to join an outer transaction
         """
         if not data_list:
             return 0
 
+        # LOAD DATA bypasses SQL parsing per row and is much faster at scale
+        if conn is None and len(data_list) >= 10000:
+            return self.load_data(table, data_list)
+
+        external_conn = conn is not None
         cursor = None
         try:
-            conn = self.get_connection()
+            if conn is None:
+                conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
             # Get columns from first record
-            columns = ", ".join(data_list[0].keys())
-            placeholders = ", ".join(["%s"] * len(data_list[0]))
-            query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+            all_columns = list(data_list[0].keys())
+            columns = ", ".join(all_columns)
+            row_placeholders = "(" + ", ".join(["%s"] * len(all_columns)) + ")"
+            getter = _row_getter(all_columns)
+
+            affected_rows = 0
+            for chunk in _chunked(data_list, batch_size):
+                query = (f"INSERT INTO {table} ({columns}) VALUES "
+                         + ", ".join([row_placeholders] * len(chunk)))
+                flat_values = list(itertools.chain.from_iterable(
+                    getter(record) for record in chunk))
+                cursor.execute(query, flat_values)
+                affected_rows += cursor.rowcount
+
+            if not external_conn and not conn.autocommit:
+                conn.commit()
 
-            # Prepare data for executemany
-            values_list = [tuple(record.values()) for record in data_list]
+            self.logger.info(f"Batch insert completed. {affected_rows} records inserted")
+            return affected_rows
+
+        except Error as e:
+            if conn and not external_conn and not conn.autocommit:
+                conn.rollback()
+            self.logger.error(f"Error in batch insert: {e}")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn and not external_conn:
+                conn.close()  # Return connection to the pool
+
+    def load_data(self, table: str, data_list: List[Dict[str, Any]],
+                  columns: Optional[List[str]] = None) -> int:
+        """
+        Bulk-load records through LOAD DATA LOCAL INFILE
+
+        Rows are spooled to a temporary tab-separated file and streamed to
+        the server in one statement, skipping per-row SQL parsing entirely.
+        insert_batch dispatches here automatically for very large batches
+        """
+        if not data_list:
+            return 0
+
+        all_columns = columns or list(data_list[0].keys())
+        getter = _row_getter(all_columns)
+
+        conn = None
+        cursor = None
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile('w', suffix='.tsv', newline='',
+                                             encoding='utf-8', delete=False) as tmp:
+                tmp_path = tmp.name
+                _write_load_data_rows(tmp, data_list, getter)
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._invalidate_table(table)
+
+            infile_path = tmp_path.replace('\\', '/')
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{infile_path}' INTO TABLE {table} "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                f"({', '.join(all_columns)})")
+            affected_rows = cursor.rowcount
 
-            cursor.executemany(query, values_list)
             if not conn.autocommit:
                 conn.commit()
 
-            affected_rows = cursor.rowcount
-            self.logger.info(f"Batch insert completed. {affected_rows} records inserted")
+            self.logger.info(f"LOAD DATA completed. {affected_rows} records loaded")
             return affected_rows
 
         except Error as e:
+            if conn and not conn.autocommit:
+                conn.rollback()
+            self.logger.error(f"Error in LOAD DATA: {e}")
+            raise
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
+
+    def load_data_upsert(self, table: str, data_list: List[Dict[str, Any]],
+                         unique_columns: Union[str, List[str]],
+                         update_columns: Optional[List[str]] = None,
+                         columns: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Bulk upsert through a temporary staging table
+
+        Rows are streamed with LOAD DATA LOCAL INFILE into a TEMPORARY
+        TABLE shaped like the target, then merged with one
+        INSERT ... SELECT ... ON DUPLICATE KEY UPDATE — two statements
+        total regardless of row count. insert_or_update_batch_precise
+        dispatches here automatically for very large batches
+        """
+        if not data_list:
+            return {"inserted": 0, "updated": 0}
+
+        if isinstance(unique_columns, str):
+            unique_columns = [unique_columns]
+        all_columns = columns or list(data_list[0].keys())
+        if update_columns is None:
+            update_columns = [col for col in all_columns if col not in unique_columns]
+        getter = _row_getter(all_columns)
+        column_sql = ", ".join(all_columns)
+        update_clause = ", ".join(f"{col} = VALUES({col})" for col in update_columns)
+        tmp_table = f"_{table}_upsert_tmp"
+
+        conn = None
+        cursor = None
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile('w', suffix='.tsv', newline='',
+                                             encoding='utf-8', delete=False) as tmp:
+                tmp_path = tmp.name
+                _write_load_data_rows(tmp, data_list, getter)
+
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            self._invalidate_table(table)
+
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {tmp_table}")
+            cursor.execute(f"CREATE TEMPORARY TABLE {tmp_table} LIKE {table}")
+            infile_path = tmp_path.replace('\\', '/')
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{infile_path}' INTO TABLE {tmp_table} "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                f"({column_sql})")
+            cursor.execute(
+                f"INSERT INTO {table} ({column_sql}) "
+                f"SELECT {column_sql} FROM {tmp_table} "
+                f"ON DUPLICATE KEY UPDATE {update_clause}")
+
+            # FOUND_ROWS: rowcount = row count + changed rows, same
+            # bookkeeping as the multi-row upsert path (unchanged
+            # re-upserts land under "inserted" there too)
+            updated = max(0, cursor.rowcount - len(data_list))
+            inserted = len(data_list) - updated
+
             if not conn.autocommit:
+                conn.commit()
+
+            self.logger.info(f"LOAD DATA upsert completed. Inserted: {inserted}, Updated: {updated}")
+            return {"inserted": inserted, "updated": updated,
+                    "total_affected": inserted + updated}
+
+        except Error as e:
+            if conn and not conn.autocommit:
                 conn.rollback()
-            self.logger.error(f"Error in batch insert: {e}")
+            self.logger.error(f"Error in LOAD DATA upsert: {e}")
             raise
         finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
             if cursor:
+                # Pooled sessions outlive this call, so the temp table
+                # must not linger into the next borrower
+                try:
+                    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {tmp_table}")
+                except Error:
+                    pass
                 cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
 
     def update_by_id(self, table: str, id_value: Any, data: Dict[str, Any], id_column: str = "id") -> int:
         """
         Update record by ID with transaction control
         """
+        conn = None
         cursor = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
-            set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
+            set_clause, set_params = _build_set_clause(data)
             query = f"UPDATE {table} SET {set_clause} WHERE {id_column} = %s"
 
-            params = tuple(data.values()) + (id_value,)
+            params = tuple(set_params) + (id_value,)
             cursor.execute(query, params)
             if not conn.autocommit:
                 conn.commit()
 
             affected_rows = cursor.rowcount
-            self.logger.info(f"Update completed. {affected_rows} rows affected")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Update completed. %d rows affected", affected_rows)
             return affected_rows
 
         except Error as e:
-            if not conn.autocommit:
+            if conn and not conn.autocommit:
                 conn.rollback()
             self.logger.error(f"Error updating record: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
 
     def update_with_conditions(self, table: str, data: Dict[str, Any], conditions: str,
                                params: Optional[Tuple] = None) -> int:
         """
         Update records with custom conditions
         """
+        conn = None
         cursor = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
-            set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
+            set_clause, set_params = _build_set_clause(data)
             query = f"UPDATE {table} SET {set_clause} WHERE {conditions}"
 
-            update_params = tuple(data.values())
+            update_params = tuple(set_params)
             if params:
                 update_params += params
 
@@ -342,69 +723,95 @@ class DbHelper:
                 conn.commit()
 
             affected_rows = cursor.rowcount
-            self.logger.info(f"Update completed. {affected_rows} rows affected")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Update completed. %d rows affected", affected_rows)
             return affected_rows
 
         except Error as e:
-            if not conn.autocommit:
+            if conn and not conn.autocommit:
                 conn.rollback()
             self.logger.error(f"Error updating records: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
 
-    def update_batch(self, table: str, data_list: List[Dict[str, Any]], id_column: str = "id") -> int:
+    def update_batch(self, table: str, data_list: List[Dict[str, Any]], id_column: str = "id",
+                     batch_size: int = 500, conn=None) -> int:
         """
-        Update multiple records in batch
+        Update multiple records in one CASE WHEN statement per chunk
+
+        Rows are grouped by their column set so heterogeneous batches
+        still fuse into as few statements as possible
+        Pass conn from transaction() to join an outer transaction
         """
         if not data_list:
             return 0
 
+        external_conn = conn is not None
         cursor = None
         try:
-            conn = self.get_connection()
+            if conn is None:
+                conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
             total_affected = 0
 
+            # Group rows by their non-id column set
+            groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
             for data in data_list:
                 if id_column not in data:
                     raise ValueError(f"ID column '{id_column}' not found in data")
-
-                id_value = data.pop(id_column)
-
-                set_clause = ", ".join([f"{key} = %s" for key in data.keys()])
-                query = f"UPDATE {table} SET {set_clause} WHERE {id_column} = %s"
-
-                params = tuple(data.values()) + (id_value,)
-                cursor.execute(query, params)
-                total_affected += cursor.rowcount
-
-                data[id_column] = id_value
-
-            if not conn.autocommit:
+                cols = tuple(key for key in data.keys() if key != id_column)
+                groups.setdefault(cols, []).append(data)
+
+            for cols, rows in groups.items():
+                if not cols:
+                    continue
+                for chunk in _chunked(rows, batch_size):
+                    ids = [row[id_column] for row in chunk]
+                    set_parts = []
+                    params: List[Any] = []
+                    for col in cols:
+                        whens = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                        set_parts.append(f"{col} = CASE {id_column} {whens} END")
+                        for row in chunk:
+                            params.extend((row[id_column], row[col]))
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    query = (f"UPDATE {table} SET " + ", ".join(set_parts)
+                             + f" WHERE {id_column} IN ({placeholders})")
+                    cursor.execute(query, params + ids)
+                    total_affected += cursor.rowcount
+
+            if not external_conn and not conn.autocommit:
                 conn.commit()
             self.logger.info(f"Batch update completed. {total_affected} rows affected")
             return total_affected
 
         except Error as e:
-            if not conn.autocommit:
+            if conn and not external_conn and not conn.autocommit:
                 conn.rollback()
             self.logger.error(f"Error in batch update: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
+            if conn and not external_conn:
+                conn.close()  # Return connection to the pool
 
     def delete_by_id(self, table: str, id_value: Any, id_column: str = "id") -> int:
         """
         Delete record by ID
         """
+        conn = None
         cursor = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
             query = f"DELETE FROM {table} WHERE {id_column} = %s"
             cursor.execute(query, (id_value,))
@@ -412,26 +819,31 @@ class DbHelper:
                 conn.commit()
 
             affected_rows = cursor.rowcount
-            self.logger.info(f"Delete completed. {affected_rows} rows affected")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Delete completed. %d rows affected", affected_rows)
             return affected_rows
 
         except Error as e:
-            if not conn.autocommit:
+            if conn and not conn.autocommit:
                 conn.rollback()
             self.logger.error(f"Error deleting record: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
 
     def delete_with_conditions(self, table: str, conditions: str, params: Optional[Tuple] = None) -> int:
         """
         Delete records with custom conditions
         """
+        conn = None
         cursor = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
             query = f"DELETE FROM {table} WHERE {conditions}"
 
@@ -444,42 +856,60 @@ class DbHelper:
                 conn.commit()
 
             affected_rows = cursor.rowcount
-            self.logger.info(f"Delete completed. {affected_rows} rows affected")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Delete completed. %d rows affected", affected_rows)
             return affected_rows
 
         except Error as e:
-            if not conn.autocommit:
+            if conn and not conn.autocommit:
                 conn.rollback()
             self.logger.error(f"Error deleting records: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
+            if conn:
+                conn.close()  # Return connection to the pool
 
-    def count_records(self, table: str, conditions: Optional[str] = None, params: Optional[Tuple] = None) -> int:
+    def count_records(self, table: str, conditions: Optional[str] = None, params: Optional[Tuple] = None,
+                      fast_approx: bool = False) -> int:
         """
         Count records in table with optional conditions
+        fast_approx=True returns InnoDB's table_rows estimate - O(1)
+        instead of a full index scan, but it may lag the true count;
+        only used when no conditions are given
         """
-        query = f"SELECT COUNT(*) FROM {table}"
-        if conditions:
-            query += f" WHERE {conditions}"
+        if fast_approx and conditions is None:
+            query = ("SELECT table_rows FROM information_schema.tables "
+                     "WHERE table_schema = %s AND table_name = %s")
+            results = self.execute_query(query, (self.database, table))
+            if results and results[0][0] is not None:
+                return int(results[0][0])
+            return 0
+
+        query = _build_count_sql(table, conditions)
 
         results = self.execute_query(query, params)
         return results[0][0] if results else 0
 
     def insert_or_update_batch(self, table: str, data_list: List[Dict[str, Any]],
                                unique_columns: Union[str, List[str]],
-                               update_columns: Optional[List[str]] = None) -> Dict[str, int]:
+                               update_columns: Optional[List[str]] = None,
+                               conn=None) -> Dict[str, int]:
         """
         Insert batch records, if unique columns exist then update specified columns
+        Pass conn from transaction() to join an outer transaction
         """
         if not data_list:
             return {"inserted": 0, "updated": 0}
 
+        external_conn = conn is not None
         cursor = None
         try:
-            conn = self.get_connection()
+            if conn is None:
+                conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
             # Normalize unique_columns to list
             if isinstance(unique_columns, str):
@@ -492,15 +922,14 @@ class DbHelper:
             if update_columns is None:
                 update_columns = [col for col in all_columns if col not in unique_columns]
 
-            # Validate that unique columns exist in data
-            for col in unique_columns:
-                if col not in all_columns:
-                    raise ValueError(f"Unique column '{col}' not found in data")
-
-            # Validate that update columns exist in data
-            for col in update_columns:
-                if col not in all_columns:
-                    raise ValueError(f"Update column '{col}' not found in data")
+            # Validate unique/update columns in one set-difference pass
+            known_columns = set(all_columns)
+            missing_unique = [col for col in unique_columns if col not in known_columns]
+            if missing_unique:
+                raise ValueError(f"Unique column '{missing_unique[0]}' not found in data")
+            missing_update = [col for col in update_columns if col not in known_columns]
+            if missing_update:
+                raise ValueError(f"Update column '{missing_update[0]}' not found in data")
 
             # Build INSERT part
             columns = ", ".join(all_columns)
@@ -516,11 +945,12 @@ class DbHelper:
             """
 
             # Prepare data for executemany
-            values_list = [tuple(record.values()) for record in data_list]
+            getter = _row_getter(all_columns)
+            values_list = [getter(record) for record in data_list]
 
             # Execute batch insert/update
             cursor.executemany(query, values_list)
-            if not conn.autocommit:
+            if not external_conn and not conn.autocommit:
                 conn.commit()
 
             # Calculate inserted vs updated records
@@ -540,31 +970,55 @@ class DbHelper:
             return result
 
         except Error as e:
-            if not conn.autocommit:
+            if conn and not external_conn and not conn.autocommit:
                 conn.rollback()
             self.logger.error(f"Error in batch upsert: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
+            if conn and not external_conn:
+                conn.close()  # Return connection to the pool
 
     def insert_or_update_batch_precise(self, table: str, data_list: List[Dict[str, Any]],
                                        unique_columns: Union[str, List[str]],
-                                       update_columns: Optional[List[str]] = None) -> Dict[str, int]:
+                                       update_columns: Optional[List[str]] = None,
+                                       batch_size: int = 1000,
+                                       conn=None) -> Dict[str, int]:
         """
-        Precise insert or update batch with better transaction handling
+        Precise insert or update batch as one multi-row upsert per chunk
+
+        With the pool's FOUND_ROWS flag MySQL reports affected_rows = 1
+        for an inserted row, 2 for a changed one and 1 (not 0) for a row
+        re-upserted with identical values, so "updated" derived from
+        rowcount counts exactly the rows that changed. Unchanged
+        re-upserts are indistinguishable from inserts at the protocol
+        level and are reported under "inserted"
         """
         if not data_list:
             return {"inserted": 0, "updated": 0}
 
+        # Very large batches skip multi-row INSERT parsing entirely and
+        # merge through the LOAD DATA staging table instead
+        if conn is None and len(data_list) >= 10000:
+            return self.load_data_upsert(table, data_list, unique_columns,
+                                         update_columns=update_columns)
+
+        external_conn = conn is not None
         cursor = None
         try:
-            conn = self.get_connection()
+            if conn is None:
+                conn = self.get_connection()
             cursor = conn.cursor()
+            self._invalidate_table(table)
 
-            # Temporarily disable autocommit for transaction
-            original_autocommit = conn.autocommit
-            conn.autocommit = False
+            # Run the chunks as one unit of work (an external
+            # transaction() conn already has one open). START TRANSACTION
+            # must be used here: assigning conn.autocommit on a pooled
+            # connection only sets an attribute on the wrapper and never
+            # reaches the real connection
+            if not external_conn:
+                conn.start_transaction()
 
             # Normalize unique_columns to list
             if isinstance(unique_columns, str):
@@ -577,41 +1031,30 @@ class DbHelper:
             if update_columns is None:
                 update_columns = [col for col in all_columns if col not in unique_columns]
 
+            columns = ", ".join(all_columns)
+            row_placeholders = "(" + ", ".join(["%s"] * len(all_columns)) + ")"
+            update_clause = ", ".join([f"{col} = VALUES({col})" for col in update_columns])
+            getter = _row_getter(all_columns)
+
             inserted_count = 0
             updated_count = 0
 
-            for data in data_list:
-                # Build condition to check if record exists
-                conditions = " AND ".join([f"{col} = %s" for col in unique_columns])
-                condition_values = tuple(data[col] for col in unique_columns)
-
-                # Check if record exists
-                check_query = f"SELECT 1 FROM {table} WHERE {conditions} LIMIT 1"
-                cursor.execute(check_query, condition_values)
-                exists = cursor.fetchone() is not None
-
-                if exists:
-                    # Update existing record
-                    if update_columns:
-                        set_clause = ", ".join([f"{col} = %s" for col in update_columns])
-                        update_query = f"UPDATE {table} SET {set_clause} WHERE {conditions}"
-
-                        update_values = tuple(data[col] for col in update_columns) + condition_values
-                        cursor.execute(update_query, update_values)
-
-                        if cursor.rowcount > 0:
-                            updated_count += 1
-                else:
-                    # Insert new record
-                    columns = ", ".join(all_columns)
-                    placeholders = ", ".join(["%s"] * len(all_columns))
-                    insert_query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-
-                    cursor.execute(insert_query, tuple(data.values()))
-                    inserted_count += 1
-
-            conn.commit()
-            conn.autocommit = original_autocommit
+            for chunk in _chunked(data_list, batch_size):
+                query = (f"INSERT INTO {table} ({columns}) VALUES "
+                         + ", ".join([row_placeholders] * len(chunk))
+                         + f" ON DUPLICATE KEY UPDATE {update_clause}")
+                flat_values = list(itertools.chain.from_iterable(
+                    getter(record) for record in chunk))
+                cursor.execute(query, flat_values)
+
+                # FOUND_ROWS: rowcount = chunk size + changed rows, so
+                # the difference is exactly the changed-row count
+                updated = max(0, cursor.rowcount - len(chunk))
+                inserted_count += len(chunk) - updated
+                updated_count += updated
+
+            if not external_conn:
+                conn.commit()
 
             result = {
                 "inserted": inserted_count,
@@ -623,42 +1066,96 @@ class DbHelper:
             return result
 
         except Error as e:
-            conn.rollback()
-            conn.autocommit = original_autocommit
+            if conn and not external_conn:
+                conn.rollback()
             self.logger.error(f"Error in precise batch upsert: {e}")
             raise
         finally:
             if cursor:
                 cursor.close()
+            if conn and not external_conn:
+                conn.close()  # Return connection to the pool
 
     def select_first_order_by(self, table: str, col_name: str, sort_type: str = 'ASC',
                               conditions: Optional[str] = None, params: Optional[Tuple] = None) -> Optional[Dict]:
         """
         Select first record ordered by specified column with fresh connection
         """
-        # Force fresh connection for SELECT queries to avoid stale data
-        if self.connection:
-            try:
-                self.connection.ping(reconnect=True, attempts=1, delay=0)
-            except:
-                # If ping fails, close connection to force new one
-                self.close_connection()
-        
         # Validate sort_type to prevent SQL injection
         sort_type = sort_type.upper()
         if sort_type not in ['ASC', 'DESC']:
             raise ValueError("sort_type must be 'ASC' or 'DESC'")
 
-        # Build query
-        query = f"SELECT * FROM {table}"
+        query = _build_select_sql(table, conditions, f"{col_name} {sort_type}", "LIMIT 1")
 
-        if conditions:
-            query += f" WHERE {conditions}"
+        def _load():
+            results = self.execute_query_dict(query, params)
+            return results[0] if results else None
 
-        query += f" ORDER BY {col_name} {sort_type} LIMIT 1"
+        return self._cached_read(table, ('first', col_name, sort_type, conditions, params), _load)
 
-        results = self.execute_query_dict(query, params)
-        return results[0] if results else None
+    def ensure_action_queue_index(self):
+        """
+        Make sure the worker poll query is index-backed
+
+        claim_next_action filters on status and sorts created_at DESC;
+        a composite (status, created_at DESC) index answers it with an
+        index scan + early stop instead of a table scan + top-N sort
+        as the table fills with DONE rows. Safe to call every startup —
+        the index is only created when missing
+        """
+        index_name = "idx_action_status_created"
+        try:
+            rows = self.execute_query(
+                "SELECT 1 FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() "
+                "AND table_name = %s AND index_name = %s LIMIT 1",
+                (TableNames.ACTION, index_name))
+            if rows:
+                return
+            conn = self.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"CREATE INDEX {index_name} ON {TableNames.ACTION} "
+                    f"({ColNames.STATUS}, {ColNames.CREATED_AT} DESC)")
+                conn.commit()
+                cursor.close()
+                self.logger.info(f"Created index {index_name} on {TableNames.ACTION}")
+            finally:
+                conn.close()  # Return connection to the pool
+        except Exception as e:
+            self.logger.error(f"Error ensuring action queue index: {e}")
+
+    def claim_next_action(self) -> Optional[Dict]:
+        """
+        Atomically claim the newest pending action for this worker
+
+        SELECT ... FOR UPDATE SKIP LOCKED and the IN_PROGRESS flip share
+        one transaction, so parallel workers never grab the same row and
+        a contended row is skipped instead of waited on
+        """
+        with self.transaction() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(
+                    f"SELECT * FROM {TableNames.ACTION} "
+                    f"WHERE {ColNames.STATUS} = %s "
+                    f"ORDER BY {ColNames.CREATED_AT} DESC "
+                    f"LIMIT 1 FOR UPDATE SKIP LOCKED",
+                    (ActionStatus.PENDING,))
+                action = cursor.fetchone()
+                if action is None:
+                    return None
+                cursor.execute(
+                    f"UPDATE {TableNames.ACTION} "
+                    f"SET {ColNames.STATUS} = %s, "
+                    f"{ColNames.UPDATED_AT} = CURRENT_TIMESTAMP "
+                    f"WHERE {ColNames.ID} = %s",
+                    (ActionStatus.IN_PROGRESS, action[ColNames.ID]))
+                return action
+            finally:
+                cursor.close()
 
     def select_first_multiple_order_by(self, table: str, order_columns: List[Tuple[str, str]],
                                        conditions: Optional[str] = None, params: Optional[Tuple] = None) -> Optional[Dict]:
@@ -678,13 +1175,7 @@ class DbHelper:
 
         order_clause = ", ".join(order_parts)
 
-        # Build query
-        query = f"SELECT * FROM {table}"
-
-        if conditions:
-            query += f" WHERE {conditions}"
-
-        query += f" ORDER BY {order_clause} LIMIT 1"
+        query = _build_select_sql(table, conditions, order_clause, "LIMIT 1")
 
         results = self.execute_query_dict(query, params)
         return results[0] if results else None
@@ -703,13 +1194,7 @@ class DbHelper:
         if limit <= 0:
             raise ValueError("limit must be greater than 0")
 
-        # Build query
-        query = f"SELECT * FROM {table}"
-
-        if conditions:
-            query += f" WHERE {conditions}"
-
-        query += f" ORDER BY {col_name} {sort_type} LIMIT {limit}"
+        query = _build_select_sql(table, conditions, f"{col_name} {sort_type}", f"LIMIT {limit}")
 
         return self.execute_query_dict(query, params)
 
@@ -733,3 +1218,34 @@ class DbHelper:
                          conditions: Optional[str] = None, params: Optional[Tuple] = None) -> Optional[Dict]:
         """Get record with maximum value in specified column"""
         return self.select_first_order_by(table, col_name, 'DESC', conditions, params)
+
+    @classmethod
+    def _generate_table_accessors(cls, name: str, table: str):
+        """
+        Emit select_/insert_/update_/delete_<name> methods with the SQL
+        baked in for the hot tables, skipping per-call string assembly
+        """
+        select_sql = f"SELECT * FROM {table} WHERE id = %s"
+
+        def _select_by_id(self, id_value):
+            results = self.execute_query_dict(select_sql, (id_value,), prepared=True)
+            return results[0] if results else None
+
+        def _insert(self, data):
+            return cls.insert_one(self, table, data)
+
+        def _update_by_id(self, id_value, data):
+            return cls.update_by_id(self, table, id_value, data)
+
+        def _delete_by_id(self, id_value):
+            return cls.delete_by_id(self, table, id_value)
+
+        setattr(cls, f"select_{name}_by_id", _select_by_id)
+        setattr(cls, f"insert_{name}", _insert)
+        setattr(cls, f"update_{name}_by_id", _update_by_id)
+        setattr(cls, f"delete_{name}_by_id", _delete_by_id)
+
+
+# Specialized accessors for the only two tables this app touches
+DbHelper._generate_table_accessors("action", TableNames.ACTION)
+DbHelper._generate_table_accessors("camera", TableNames.CAMERA)
@@ -3,21 +3,70 @@ import os
 import shutil
 import signal
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 
-from CamHelper import test_rtsp_connection, capture_frame_robust, get_frame_sharpness
+import cv2
+import numpy as np
+
+from CamHelper import test_rtsp_connection, capture_frame_robust, get_frame_sharpness, \
+    capture_n_frames, get_sharpness_from_frame
 from FrameHelper import cleanup_session_frames, cleanup_old_backups
 from common import logger, BACKUP_FOLDER, VIDEO_FOLDER, FRAME_FOLDER, CONFIG_FILE, get_disk_space_mb, \
-    read_status, write_status, get_session_frames, renumber_frames_for_video
+    read_status, write_status, get_session_frames, build_concat_list
+
+# Quality settings based on selection
+_QUALITY_SETTINGS = {
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080)
+}
+
+# Platform H.264 hardware encoders, in preference order
+_HW_ENCODERS = ("h264_v4l2m2m", "h264_nvenc", "h264_videotoolbox", "h264_vaapi")
+
+# The frame buffer may be a small tmpfs (half of RAM on a Pi); it only
+# needs room for one session of JPEGs, not the card-sized threshold
+_FRAME_SPACE_MIN_MB = 64
+
+
+@lru_cache(maxsize=1)
+def _detect_hw_encoder():
+    """Probe ffmpeg once for a hardware H.264 encoder (Pi/Jetson/Mac/VAAPI)"""
+    try:
+        res = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                             capture_output=True, text=True, timeout=15)
+        for encoder in _HW_ENCODERS:
+            if encoder in res.stdout:
+                logger.info(f"Using hardware encoder: {encoder}")
+                return encoder
+    except Exception as e:
+        logger.error(f"Error probing ffmpeg encoders: {e}")
+    return None
 
 
 class TimelapseWorker:
+    # Fixed attribute set: no per-instance __dict__, faster attribute
+    # access in the capture loop
+    __slots__ = (
+        'frame_height', 'frame_width', 'disk_warning_threshold', 'codec',
+        'preset', 'threads', 'output_fps', 'quality', 'interval', 'rtsp_url',
+        'recording', 'current_session', 'frame_count', 'session_start_time',
+        'error_count', 'last_good_frame', 'running', 'processing_video',
+        '_config_mtime', 'stream_encode', 'ffmpeg_proc', '_stream_output',
+        '_stream_temp', '_frame_fmt', '_backup_fmt', '_backup_executor'
+    )
+
     def __init__(self):
         self.frame_height = 720
         self.frame_width = 1280
         self.disk_warning_threshold = 1024
         self.codec = 'h264'
+        self.preset = 'faster'
+        self.threads = 0
         self.output_fps = 15
         self.quality = "720p"
         self.interval = 10
@@ -30,6 +79,18 @@ class TimelapseWorker:
         self.last_good_frame = None
         self.running = True
         self.processing_video = False  # Trạng thái xử lý video
+        self._config_mtime = 0
+        self.stream_encode = False
+        self.ffmpeg_proc = None
+        self._stream_output = None
+        self._stream_temp = None
+        # Precomputed path templates: one % substitution per capture
+        # instead of f-string + os.path.join on the hot path
+        self._frame_fmt = os.path.join(FRAME_FOLDER, "frame_%06d.jpg")
+        self._backup_fmt = os.path.join(BACKUP_FOLDER, "backup_%06d.jpg")
+        # Single writer thread keeps persistent-storage backups off the
+        # capture loop; writes overlap the next RTSP capture
+        self._backup_executor = ThreadPoolExecutor(max_workers=1)
 
         # Load configuration
         self.load_config()
@@ -39,29 +100,36 @@ class TimelapseWorker:
         signal.signal(signal.SIGTERM, self.signal_handler)
 
     def load_config(self):
-        """Load configuration from config file"""
+        """Load configuration from config file (skipped unless it changed)"""
         try:
+            # The run() loop calls this every interval; one stat is enough
+            # to know nothing changed — no reason to re-parse the JSON
+            st = os.stat(CONFIG_FILE)
+            if st.st_mtime == self._config_mtime:
+                return
+
             with open(CONFIG_FILE, 'r') as f:
                 config = json.load(f)
+            self._config_mtime = st.st_mtime
 
             self.rtsp_url = config.get("rtsp_url", "")
             self.interval = config.get("interval", 10)
             self.quality = config.get("quality", "720p")
             self.output_fps = config.get("output_fps", 5)
             self.codec = config.get("codec", "h264")
+            # "faster" encodes timelapse content several times quicker than
+            # "medium" with negligible quality loss; "superfast" for weak SBCs
+            self.preset = config.get("preset", "faster")
+            self.threads = config.get("threads", 0)  # 0 = let x264 use all cores
+            # Pipe raw frames straight into a long-lived encoder, skipping
+            # all intermediate JPEGs (no per-frame backups in this mode)
+            self.stream_encode = config.get("stream_encode", False)
             self.frame_width = config.get("frame_width", 1280)
             self.frame_height = config.get("frame_height", 720)
             self.disk_warning_threshold = config.get("disk_warning_threshold", 1024)  # MB
 
-            # Quality settings based on selection
-            quality_settings = {
-                "480p": (640, 480),
-                "720p": (1280, 720),
-                "1080p": (1920, 1080)
-            }
-
-            if self.quality in quality_settings:
-                self.frame_width, self.frame_height = quality_settings[self.quality]
+            if self.quality in _QUALITY_SETTINGS:
+                self.frame_width, self.frame_height = _QUALITY_SETTINGS[self.quality]
 
         except Exception as e:
             logger.error(f"Error loading config: {e}")
@@ -69,10 +137,18 @@ class TimelapseWorker:
 
     def check_disk_space(self):
         """Kiểm tra dung lượng ổ đĩa có đủ không"""
-        free_space_mb = get_disk_space_mb()
+        # The configured threshold guards the persistent card, where the
+        # videos and backups end up
+        free_space_mb = get_disk_space_mb(VIDEO_FOLDER)
         if free_space_mb < self.disk_warning_threshold:
             logger.warning(f"Low disk space: {free_space_mb} MB < {self.disk_warning_threshold} MB")
             return False
+        # The frame buffer is judged on its own small bound — a tmpfs
+        # can never satisfy the card threshold on low-RAM boxes
+        frame_space_mb = get_disk_space_mb(FRAME_FOLDER)
+        if frame_space_mb < _FRAME_SPACE_MIN_MB:
+            logger.warning(f"Low frame buffer space: {frame_space_mb} MB < {_FRAME_SPACE_MIN_MB} MB")
+            return False
         return True
 
     def signal_handler(self, signum, frame):
@@ -101,73 +177,147 @@ class TimelapseWorker:
         # Clean up any existing frames from previous sessions
         cleanup_session_frames()
 
+        if self.stream_encode:
+            self._start_stream_encoder()
+
         logger.info(f"Starting new session: {self.current_session}")
 
+    def _start_stream_encoder(self):
+        """Spawn a long-lived ffmpeg fed raw BGR frames over stdin
+
+        No JPEG encode/decode and no intermediate frame files — every
+        selected frame goes straight into the encoder
+        """
+        output_path = os.path.join(VIDEO_FOLDER, self.current_session or "output.mp4")
+        self._stream_output = output_path
+        self._stream_temp = output_path.replace(".mp4", "_tmp.mp4")
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{self.frame_width}x{self.frame_height}",
+            "-framerate", str(self.output_fps),
+            "-i", "-",
+            "-c:v", "libx264",
+            "-preset", self.preset,
+            "-crf", "23",
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            self._stream_temp
+        ]
+        try:
+            self.ffmpeg_proc = subprocess.Popen(
+                cmd, stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                bufsize=0)
+        except Exception as e:
+            logger.error(f"Error starting stream encoder: {e}")
+            self.ffmpeg_proc = None
+
     def capture_best_frame(self):
-        """Capture multiple frames and select the best one"""
+        """Capture several frames over one RTSP session and keep the best"""
         # Kiểm tra dung lượng ổ đĩa trước khi capture
         if not self.check_disk_space():
             logger.error("Insufficient disk space, skipping frame capture")
             return False
 
-        temp_frames = []
-        best_frame = None
-        best_score = -1
+        # Use consistent naming: frame_000001.jpg, frame_000002.jpg, etc.
+        final_path = self._frame_fmt % (self.frame_count + 1)
 
         try:
-            # Capture 3 frames over a short period for quality selection
-            for i in range(3):
-                temp_path = os.path.join(FRAME_FOLDER, f"temp_{i:03d}.jpg")
-
-                if capture_frame_robust(self.rtsp_url, self.frame_width, self.frame_height, temp_path):
-                    sharpness = get_frame_sharpness(temp_path)
-                    temp_frames.append((temp_path, sharpness))
-
+            # One RTSP handshake yields all candidates; scoring happens in
+            # memory and only the winner is written to disk
+            frames = capture_n_frames(self.rtsp_url, self.frame_width, self.frame_height, 3)
+
+            if frames:
+                best_frame = None
+                best_score = -1
+                for frame in frames:
+                    sharpness = get_sharpness_from_frame(frame)
                     if sharpness > best_score:
                         best_score = sharpness
-                        best_frame = temp_path
-
-                    # Small delay between captures
-                    time.sleep(0.5)
-                else:
-                    logger.warning(f"Failed to capture temp frame {i}")
+                        best_frame = frame
+
+                if best_frame is None or best_score <= 0:
+                    logger.error("No good frames captured")
+                    return False
+
+                if self.stream_encode and self.ffmpeg_proc:
+                    # Raw BGR straight into the encoder: no JPEG, no files
+                    self.ffmpeg_proc.stdin.write(
+                        np.ascontiguousarray(best_frame).tobytes())
+                    self.frame_count += 1
+                    logger.info(f"Streamed frame {self.frame_count} "
+                                f"with sharpness {best_score:.2f}")
+                    return True
+
+                if not cv2.imwrite(final_path, best_frame):
+                    logger.error(f"Failed to write frame: {final_path}")
+                    return False
+            else:
+                # Session refused — fall back to the concurrent ffmpeg path
+                if not capture_frame_robust(self.rtsp_url, self.frame_width,
+                                            self.frame_height, final_path):
+                    logger.error("No good frames captured")
+                    return False
+                best_score = get_frame_sharpness(final_path)
+
+                if self.stream_encode and self.ffmpeg_proc:
+                    # The streamed video only contains what reaches the
+                    # encoder's stdin — decode the fallback JPEG and pipe
+                    # it like a normal streamed frame
+                    frame = cv2.imread(final_path)
+                    if frame is None:
+                        logger.error("Fallback frame unreadable for stream encode")
+                        return False
+                    if frame.shape[1] != self.frame_width or frame.shape[0] != self.frame_height:
+                        frame = cv2.resize(frame, (self.frame_width, self.frame_height),
+                                           interpolation=cv2.INTER_AREA)
+                    self.ffmpeg_proc.stdin.write(
+                        np.ascontiguousarray(frame).tobytes())
+                    try:
+                        os.remove(final_path)  # stream mode keeps no frame files
+                    except OSError:
+                        pass
+                    self.frame_count += 1
+                    logger.info(f"Streamed fallback frame {self.frame_count} "
+                                f"with sharpness {best_score:.2f}")
+                    return True
 
-            # Save best frame with proper sequential naming
-            if best_frame and best_score > 0:
-                # Use consistent naming: frame_000001.jpg, frame_000002.jpg, etc.
-                final_path = os.path.join(FRAME_FOLDER, f"frame_{self.frame_count + 1:06d}.jpg")
-                shutil.copy2(best_frame, final_path)
+            # Backup good frames (giới hạn số lượng backup) — submitted to
+            # the writer thread so slow flash never stalls the capture loop
+            backup_path = self._backup_fmt % (self.frame_count + 1)
+            self._backup_executor.submit(self._write_backup, final_path, backup_path)
 
-                # Backup good frames (giới hạn số lượng backup)
-                backup_path = os.path.join(BACKUP_FOLDER, f"backup_{self.frame_count + 1:06d}.jpg")
-                shutil.copy2(best_frame, backup_path)
+            self.last_good_frame = final_path
+            self.frame_count += 1
 
-                self.last_good_frame = final_path
-                self.frame_count += 1
+            logger.info(f"Captured frame {self.frame_count} with sharpness {best_score:.2f}")
 
-                logger.info(f"Captured frame {self.frame_count} with sharpness {best_score:.2f}")
+            # Periodically clean old backups to save disk space
+            if self.frame_count % 50 == 0:
+                cleanup_old_backups()
 
-                # Cleanup temp frames
-                for temp_path, _ in temp_frames:
-                    try:
-                        os.remove(temp_path)
-                    except Exception as e:
-                        logger.error(f"Error deleting temp frame {temp_path}: {e}")
-                        pass
-
-                # Periodically clean old backups to save disk space
-                if self.frame_count % 50 == 0:
-                    cleanup_old_backups()
-
-                return True
-            else:
-                logger.error("No good frames captured")
-                return False
+            return True
 
         except Exception as e:
             logger.error(f"Error in capture_best_frame: {e}")
             return False
 
+    @staticmethod
+    def _write_backup(final_path, backup_path):
+        """Backup one frame off the capture thread"""
+        try:
+            # Hardlink shares the inode: a second name at zero data cost
+            os.link(final_path, backup_path)
+        except OSError:
+            # Cross-device (e.g. tmpfs frames) or unsupported filesystem
+            try:
+                shutil.copy2(final_path, backup_path)
+            except Exception as e:
+                logger.error(f"Error writing backup {backup_path}: {e}")
+
     def create_video(self, output_path):
         """Create final video from captured frames"""
         try:
@@ -184,48 +334,83 @@ class TimelapseWorker:
 
             logger.info(f"Creating video from {len(frame_files)} frames")
 
-            # Renumber frames to ensure continuous sequence
-            if not renumber_frames_for_video():
-                logger.error("Failed to renumber frames")
-                self.update_processing_status(False)
-                return False
-
-            # Frame pattern for FFmpeg (starts from 1)
-            frame_pattern = os.path.join(FRAME_FOLDER, "frame_%06d.jpg")
-
-            # Verify first frame exists
-            first_frame = os.path.join(FRAME_FOLDER, "frame_000001.jpg")
-            if not os.path.exists(first_frame):
-                logger.error(f"First frame not found: {first_frame}")
-                # List available frames for debugging
-                available_frames = [f for f in os.listdir(FRAME_FOLDER) if f.startswith("frame_")]
-                logger.error(f"Available frames: {available_frames[:10]}...")  # Show first 10
+            # Concat list lets ffmpeg read the frames in place — no
+            # copy/delete renumber pass over the whole session
+            concat_list = build_concat_list(frame_files, self.output_fps)
+            if not concat_list:
+                logger.error("Failed to build concat list")
                 self.update_processing_status(False)
                 return False
 
             # Create temporary output path
             temp_output = output_path.replace(".mp4", "_tmp.mp4")
 
+            # Prefer a hardware encoder; HW encoders take -qp instead of -crf
+            hw_encoder = _detect_hw_encoder() if self.codec == "h264" else None
+            if hw_encoder == "h264_vaapi":
+                codec_args = [
+                    "-vaapi_device", "/dev/dri/renderD128",
+                    "-vf", "format=nv12,hwupload",
+                    "-c:v", hw_encoder,
+                    "-qp", "26"
+                ]
+            elif hw_encoder:
+                codec_args = ["-c:v", hw_encoder, "-qp", "26", "-pix_fmt", "yuv420p"]
+            else:
+                codec_args = [
+                    "-c:v", "libx264" if self.codec == "h264" else "libx265",
+                    "-preset", self.preset,
+                    "-threads", str(self.threads),
+                    "-crf", "23",
+                    "-pix_fmt", "yuv420p"
+                ]
+
             # Video encoding command
             cmd = [
                 "ffmpeg",
                 "-y",  # Overwrite output
-                "-framerate", str(self.output_fps),
-                "-start_number", "1",  # Start from frame 1
-                "-i", frame_pattern,
-                "-c:v", "libx264" if self.codec == "h264" else "libx265",
-                "-preset", "medium",
-                "-crf", "23",
-                "-pix_fmt", "yuv420p",
+                "-f", "concat",
+                "-safe", "0",
+                "-i", concat_list,
+                "-vsync", "vfr",
+                *codec_args,
                 "-movflags", "+faststart",
                 temp_output,
-                "-loglevel", "info"  # Changed to info for better debugging
+                "-loglevel", "error",
+                "-nostats"
             ]
 
             logger.info(f"Running FFmpeg command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)  # Tăng timeout
+            # Stream stderr line-by-line instead of buffering the whole
+            # encode log in RAM; with -loglevel error it stays tiny
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE, text=True)
+            stderr_lines = []
+
+            def _drain_stderr():
+                for line in proc.stderr:
+                    line = line.rstrip()
+                    stderr_lines.append(line)
+                    logger.debug(line)
+
+            # Drain on a helper thread so the wait() below bounds the
+            # whole encode — reading stderr inline would block without
+            # a deadline if ffmpeg hangs mid-encode
+            drain = threading.Thread(target=_drain_stderr, daemon=True)
+            drain.start()
+            try:
+                returncode = proc.wait(timeout=600)  # Tăng timeout
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                logger.error("Video creation timed out after 600s, FFmpeg killed")
+                if os.path.exists(temp_output):
+                    os.remove(temp_output)
+                self.update_processing_status(False)
+                return False
+            drain.join(timeout=5)
 
-            if result.returncode == 0:
+            if returncode == 0:
                 # Move temp file to final location
                 shutil.move(temp_output, output_path)
                 logger.info(f"Video created successfully: {output_path}")
@@ -234,7 +419,8 @@ class TimelapseWorker:
                 self.update_processing_status(False)
                 return True
             else:
-                logger.error(f"Video creation failed: {result.stderr}")
+                ffmpeg_errors = "\n".join(stderr_lines)
+                logger.error(f"Video creation failed: {ffmpeg_errors}")
                 # Clean up temp file if it exists
                 if os.path.exists(temp_output):
                     os.remove(temp_output)
@@ -249,8 +435,32 @@ class TimelapseWorker:
             self.update_processing_status(False)
             return False
 
+    def _finalize_stream_video(self):
+        """Close the raw-frame pipe and let ffmpeg write the trailer"""
+        logger.info(f"Finalizing streamed video with {self.frame_count} frames...")
+        try:
+            self.update_processing_status(True)
+            self.ffmpeg_proc.stdin.close()
+            self.ffmpeg_proc.wait(timeout=600)
+            if self.ffmpeg_proc.returncode == 0:
+                shutil.move(self._stream_temp, self._stream_output)
+                logger.info(f"Video finalized: {self.current_session}")
+            else:
+                logger.error(f"Stream encoder exited with {self.ffmpeg_proc.returncode}")
+        except Exception as e:
+            logger.error(f"Error finalizing streamed video: {e}")
+        finally:
+            self.update_processing_status(False)
+            self.ffmpeg_proc = None
+            self.current_session = None
+            self.frame_count = 0
+            self.session_start_time = None
+
     def finalize_video(self):
         """Finalize current recording session"""
+        if self.stream_encode and self.ffmpeg_proc:
+            self._finalize_stream_video()
+            return
         if self.current_session and self.frame_count > 0:
             logger.info(f"Finalizing video with {self.frame_count} frames...")
             output_path = os.path.join(VIDEO_FOLDER, self.current_session)
@@ -280,6 +490,8 @@ class TimelapseWorker:
             logger.error("RTSP connection failed at startup!")
             return
 
+        deadline = time.monotonic()
+
         while self.running:
             try:
                 # Reload config periodically
@@ -325,11 +537,18 @@ class TimelapseWorker:
 
                     # Log disk space info periodically (every 20 frames)
                     if self.frame_count % 20 == 0:
-                        free_space = get_disk_space_mb()
+                        free_space = get_disk_space_mb(VIDEO_FOLDER)
                         logger.info(f"Disk space remaining: {free_space} MB")
 
-                    # Wait for next capture
-                    time.sleep(self.interval)
+                    # Sleep to the next monotonic deadline, not for a fixed
+                    # interval — capture time no longer drifts the cadence
+                    deadline += self.interval
+                    delay = deadline - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        # Capture overran the slot; skip catch-up bursts
+                        deadline = time.monotonic()
 
                 else:
                     if self.recording:
@@ -1,16 +1,17 @@
 import os
+import shutil
 
-from common import get_session_frames, logger, BACKUP_FOLDER
+from common import logger, BACKUP_FOLDER, FRAME_FOLDER
 
 
 def cleanup_session_frames():
     """Clean up frames from current session only"""
     try:
-        frame_files = get_session_frames()
-        for frame_file in frame_files:
-            os.remove(frame_file)
+        # Bulk directory removal + recreate beats one os.remove per frame
+        shutil.rmtree(FRAME_FOLDER, ignore_errors=True)
+        os.makedirs(FRAME_FOLDER, exist_ok=True)
 
-        logger.info(f"Cleaned up {len(frame_files)} session frames")
+        logger.info("Cleaned up session frames")
 
     except Exception as e:
         logger.error(f"Error cleaning up session frames: {e}")
@@ -19,7 +20,9 @@ def cleanup_session_frames():
 def cleanup_old_backups():
     """Keep only recent backup frames to save disk space"""
     try:
-        backup_files = sorted([f for f in os.listdir(BACKUP_FOLDER) if f.startswith("backup_")])
+        # scandir yields dirents without an extra stat per entry
+        with os.scandir(BACKUP_FOLDER) as it:
+            backup_files = sorted(e.name for e in it if e.name.startswith("backup_"))
         if len(backup_files) > 100:  # Keep last 100 backups (increased from 50)
             files_to_remove = backup_files[:-100]
             for f in files_to_remove:
@@ -1,9 +1,11 @@
 import ipaddress
 import platform
 import re
+import selectors
 import socket
+import struct
 import subprocess
-from concurrent.futures import ThreadPoolExecutor
+import time
 
 import requests
 
@@ -12,11 +14,12 @@ from common import logger, NOT_FOUND
 
 def check_ezviz_port(ip, port=554, timeout=0.5):
     try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(timeout)
-        result = s.connect_ex((str(ip), port))
-        s.close()
-        return result == 0
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            # RST on close instead of FIN handshake: no TIME_WAIT states
+            # piling up across repeated subnet scans
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            s.settimeout(timeout)
+            return s.connect_ex((str(ip), port)) == 0
     except Exception as e:
         logger.error(e)
         return False
@@ -31,25 +34,71 @@ def check_ezviz_http(ip, timeout=1):
         return False
 
 
-def scan_ezviz_fast(network="192.168.1.0/24", max_workers=100):
+def scan_ezviz_fast(network="192.168.1.0/24", max_workers=100, port=554, timeout=0.5):
+    """Scan a subnet for the RTSP port with non-blocking sockets
+
+    Every connect is issued up front and a single selectors loop polls
+    readiness, so the whole /24 finishes within one connect-timeout
+    window on one thread (max_workers kept for API compatibility)
+    """
     logger.info("Scanning EZVIZ network")
 
     network_obj = ipaddress.IPv4Network(network, strict=False)
-    ezviz_cameras = []
+    hosts = list(network_obj.hosts())
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(check_ezviz_port, ip): ip for ip in network_obj.hosts()}
+    ezviz_cameras = []
+    selector = selectors.DefaultSelector()
+    sockets = []
+    try:
+        for ip in hosts:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setblocking(False)
+            s.connect_ex((str(ip), port))
+            selector.register(s, selectors.EVENT_WRITE, data=str(ip))
+            sockets.append(s)
+
+        deadline = time.monotonic() + timeout
+        pending = len(sockets)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                selector.unregister(key.fileobj)
+                pending -= 1
+                if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    ezviz_cameras.append(key.data)
+    except Exception as e:
+        logger.error(e)
+        return []
+    finally:
+        for s in sockets:
+            try:
+                s.close()
+            except OSError:
+                pass
+        selector.close()
 
-        for future in futures:
-            ip = futures[future]
-            if future.result():
-                logger.info("EZVIZ network found")
-                ezviz_cameras.append(str(ip))
+    if ezviz_cameras:
+        logger.info("EZVIZ network found")
 
     return ezviz_cameras
 
 
+_ARP_RE = re.compile(r'(\d+\.\d+\.\d+\.\d+) +([a-zA-Z0-9-]+) +([a-z]+)')
+
+# (timestamp, result) — repeated camera lookups within the TTL reuse the
+# parsed table instead of forking arp again
+_ARP_CACHE_TTL = 5
+_arp_cache = (0.0, [])
+
+
 def get_arp_table():
+    global _arp_cache
+    cached_at, cached = _arp_cache
+    if time.monotonic() - cached_at < _ARP_CACHE_TTL:
+        return cached
+
     try:
         if platform.system().lower() == "windows":
             res = subprocess.run(['arp', '-a'], capture_output=True, text=True)
@@ -59,13 +108,14 @@ def get_arp_table():
         str_res = res.stdout.strip()
         ips = []
         for line in str_res.splitlines():
-            ip_match = re.search(r'(\d+\.\d+\.\d+\.\d+) +([a-zA-Z0-9-]+) +([a-z]+)', line)
+            ip_match = _ARP_RE.search(line)
             if not ip_match:
                 continue
             items = line.split()
             if len(items) < 2:
                 continue
             ips.append({'ip': ip_match.group(1), 'mac': ip_match.group(2), 'type': ip_match.group(3)})
+        _arp_cache = (time.monotonic(), ips)
         return ips
     except Exception as e:
         logger.error(e)
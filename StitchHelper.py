@@ -0,0 +1,195 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from common import logger
+
+
+def _cuda_available():
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except Exception:
+        return False
+
+
+def stitch_images(images):
+    """Stitch a list of image paths into one panorama
+
+    Runs the CUDA feature/warp pipeline when a device is present —
+    SURF detection and matching on GPU dominate the stitch cost —
+    and falls back to the stock CPU Stitcher otherwise
+    """
+    if len(images) < 2:
+        logger.warning("Need at least 2 images to stitch")
+        return None
+
+    imgs = _load_images(images)
+    if len(imgs) < 2:
+        logger.error("Not enough readable images to stitch")
+        return None
+
+    if _cuda_available():
+        stitched = _stitch_images_cuda(imgs)
+        if stitched is not None:
+            return stitched
+        logger.warning("CUDA stitch failed, falling back to CPU stitcher")
+
+    return _stitch_images_cpu(imgs)
+
+
+def _load_images(images):
+    """Decode the capture JPEGs, on the GPU when the build allows it
+
+    nvjpeg decode skips the host libjpeg pass entirely; otherwise the
+    decodes run in parallel on threads since cv2 releases the GIL
+    """
+    decoder = None
+    if _cuda_available() and hasattr(cv2.cuda, 'createNvjpegDecoder'):
+        try:
+            decoder = cv2.cuda.createNvjpegDecoder()
+        except Exception as e:
+            logger.error(f"Error creating nvjpeg decoder: {e}")
+
+    def _load(path):
+        if decoder is not None:
+            try:
+                with open(path, 'rb') as f:
+                    buf = np.frombuffer(f.read(), np.uint8)
+                gpu = decoder.decode(buf)
+                if gpu is not None:
+                    return gpu.download()
+            except Exception as e:
+                logger.error(f"nvjpeg decode failed for {path}: {e}")
+        return cv2.imread(path)
+
+    if decoder is not None:
+        imgs = [_load(p) for p in images]
+    else:
+        with ThreadPoolExecutor(max_workers=min(4, len(images))) as pool:
+            imgs = list(pool.map(_load, images))
+    return [img for img in imgs if img is not None]
+
+
+def write_panorama(stitched, output_path):
+    """Encode the panorama JPEG, via nvjpeg when the build exposes it
+
+    Large panoramas serialize on a single-core libjpeg encode otherwise
+    """
+    if _cuda_available() and hasattr(cv2.cuda, 'createNvjpegEncoder'):
+        try:
+            encoder = cv2.cuda.createNvjpegEncoder()
+            gpu = cv2.cuda_GpuMat()
+            gpu.upload(stitched)
+            encoded = encoder.encode(gpu)
+            if encoded is not None:
+                with open(output_path, 'wb') as f:
+                    f.write(bytes(encoded))
+                return True
+        except Exception as e:
+            logger.error(f"nvjpeg encode failed for {output_path}: {e}")
+    return bool(cv2.imwrite(output_path, stitched))
+
+
+# One Stitcher per thread: its finder/warper/blender allocations are
+# reused across sessions, and threads in the per-channel parallel
+# stitch never share an instance
+_stitcher_local = threading.local()
+
+
+def _get_stitcher():
+    stitcher = getattr(_stitcher_local, 'stitcher', None)
+    if stitcher is None:
+        stitcher = cv2.Stitcher.create(cv2.Stitcher_PANORAMA)
+        # Register at 0.3 Mpx instead of the 0.6 Mpx default: the
+        # gray/blur/gradient prep passes behind feature finding are
+        # memory-bound, so halving the working resolution halves their
+        # traffic while compositing still happens at full resolution
+        stitcher.setRegistrationResol(0.3)
+        _stitcher_local.stitcher = stitcher
+    return stitcher
+
+
+def _stitch_images_cpu(imgs):
+    try:
+        status, stitched = _get_stitcher().stitch(imgs)
+        if status != cv2.Stitcher_OK:
+            logger.error(f"Stitching failed with status {status}")
+            return None
+        return stitched
+    except Exception as e:
+        logger.error(f"Error stitching images: {e}")
+        return None
+
+
+def _stitch_images_cuda(imgs):
+    """Chain pairwise GPU stitches: SURF_CUDA + GPU BF matcher + CPU RANSAC"""
+    try:
+        surf = cv2.cuda.SURF_CUDA_create(_hessianThreshold=400)
+        matcher = cv2.cuda.DescriptorMatcher_createBFMatcher(cv2.NORM_L2)
+
+        pano = imgs[0]
+        for img in imgs[1:]:
+            pano = _cuda_stitch_pair(pano, img, surf, matcher)
+            if pano is None:
+                return None
+        return pano
+    except Exception as e:
+        logger.error(f"Error in CUDA stitch: {e}")
+        return None
+
+
+def _cuda_stitch_pair(base, img, surf, matcher):
+    gpu_base = cv2.cuda_GpuMat()
+    gpu_base.upload(base)
+    gpu_img = cv2.cuda_GpuMat()
+    gpu_img.upload(img)
+
+    gray_base = cv2.cuda.cvtColor(gpu_base, cv2.COLOR_BGR2GRAY)
+    gray_img = cv2.cuda.cvtColor(gpu_img, cv2.COLOR_BGR2GRAY)
+
+    # Detect at half resolution — sharpness of the match survives the
+    # downsample and SURF sees 4x fewer pixels; scaling the keypoint
+    # coordinates back up makes the homography valid for full res
+    gray_base_small = cv2.cuda.resize(
+        gray_base, (base.shape[1] // 2, base.shape[0] // 2),
+        interpolation=cv2.INTER_AREA)
+    gray_img_small = cv2.cuda.resize(
+        gray_img, (img.shape[1] // 2, img.shape[0] // 2),
+        interpolation=cv2.INTER_AREA)
+
+    kp_base_gpu, desc_base = surf.detectWithDescriptors(gray_base_small, None)
+    kp_img_gpu, desc_img = surf.detectWithDescriptors(gray_img_small, None)
+    kp_base = surf.downloadKeypoints(kp_base_gpu)
+    kp_img = surf.downloadKeypoints(kp_img_gpu)
+
+    matches = matcher.knnMatch(desc_img, desc_base, k=2)
+    good = [m[0] for m in matches
+            if len(m) == 2 and m[0].distance < 0.75 * m[1].distance]
+    if len(good) < 4:
+        logger.warning("Not enough feature matches for homography")
+        return None
+
+    src_pts = np.float32([kp_img[m.queryIdx].pt for m in good]).reshape(-1, 1, 2) * 2
+    dst_pts = np.float32([kp_base[m.trainIdx].pt for m in good]).reshape(-1, 1, 2) * 2
+    # Homography estimation stays on CPU — tiny input, RANSAC is cheap
+    homography, _ = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
+    if homography is None:
+        logger.warning("Homography estimation failed")
+        return None
+
+    out_size = (base.shape[1] + img.shape[1], max(base.shape[0], img.shape[0]))
+    warped_gpu = cv2.cuda.warpPerspective(gpu_img, homography, out_size)
+    pano = warped_gpu.download()
+    pano[0:base.shape[0], 0:base.shape[1]] = base
+    return _trim_black_border(pano)
+
+
+def _trim_black_border(pano):
+    gray = cv2.cvtColor(pano, cv2.COLOR_BGR2GRAY)
+    coords = cv2.findNonZero((gray > 0).astype(np.uint8))
+    if coords is None:
+        return pano
+    x, y, w, h = cv2.boundingRect(coords)
+    return pano[y:y + h, x:x + w]
@@ -1,7 +1,7 @@
 import json
 import os
 
-from common import SYS_CONFIG_FILE, logger
+from common import SYS_CONFIG_FILE, logger, _dumps
 
 
 class SysConfig:
@@ -42,7 +42,7 @@ class SysConfig:
 
     def write_sys_config(self, sys_config):
         try:
-            with open(SYS_CONFIG_FILE, 'w') as f:
-                json.dump(sys_config, f, ensure_ascii=False, indent=2)
+            with open(SYS_CONFIG_FILE, 'wb') as f:
+                f.write(_dumps(sys_config))
         except Exception as e:
             logger.error(f"Error writing cam info: {e}")
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""Manual check: two workers cannot claim the same pending action.
+
+Run against a scratch database:
+
+    python claim_race_check.py
+
+Seeds one PENDING action, then replays the claim SELECT on two pooled
+connections while the first transaction is still open. SKIP LOCKED must
+hand the second connection nothing (or a different row); if both see the
+same id, the claim in DbHelper.claim_next_action is racy.
+"""
+from DbHelper import DbHelper, TableNames, ColNames, ActionStatus, ActionType
+from common import logger
+
+_CLAIM_SQL = (f"SELECT {ColNames.ID} FROM {TableNames.ACTION} "
+              f"WHERE {ColNames.STATUS} = %s "
+              f"ORDER BY {ColNames.CREATED_AT} DESC "
+              f"LIMIT 1 FOR UPDATE SKIP LOCKED")
+
+
+def main():
+    db = DbHelper()
+    action_id = db.insert_one(TableNames.ACTION, {
+        ColNames.COMMAND: ActionType.CHECK_CONFIG,
+        ColNames.STATUS: ActionStatus.PENDING,
+        ColNames.ADDITIONS: '{}',
+    })
+
+    conn_a = db.get_connection()
+    conn_b = db.get_connection()
+    cursor_a = cursor_b = None
+    try:
+        # Worker A claims and keeps its transaction open
+        conn_a.start_transaction()
+        cursor_a = conn_a.cursor()
+        cursor_a.execute(_CLAIM_SQL, (ActionStatus.PENDING,))
+        row_a = cursor_a.fetchone()
+        assert row_a is not None, "first worker should claim the seeded row"
+
+        # Worker B tries the same claim while A's lock is held
+        conn_b.start_transaction()
+        cursor_b = conn_b.cursor()
+        cursor_b.execute(_CLAIM_SQL, (ActionStatus.PENDING,))
+        row_b = cursor_b.fetchone()
+        assert row_b is None or row_b[0] != row_a[0], \
+            f"both workers claimed action {row_a[0]} - claim is racy"
+
+        logger.info("claim race check passed: second worker was skipped")
+    finally:
+        for cursor, conn in ((cursor_a, conn_a), (cursor_b, conn_b)):
+            try:
+                if cursor is not None:
+                    cursor.close()
+                conn.rollback()
+                conn.close()  # Return connection to the pool
+            except Exception as e:
+                logger.error(f"Error releasing check connection: {e}")
+        db.delete_by_id(TableNames.ACTION, action_id)
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,35 @@
-import glob
+import atexit
 import io
 import json
 import logging
 import os
+import queue
 import shutil
 import sys
+import time
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, \
+    RotatingFileHandler
+
+try:
+    # C-extension serializer, ~5-10x faster than stdlib json
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+    _loads = json.loads
+
+try:
+    # Optional: action additions may be stored as msgpack bytes, which
+    # decode several times faster than JSON for small dicts
+    import msgpack
+except ImportError:
+    msgpack = None
 
 NOT_FOUND="not found"
 TIME_CHECK_UPDATED_IN_SECOND = 3600 # 60 phut
@@ -15,10 +40,23 @@ WORKSPACE = os.path.join(HOME_DIRECTORY, ".mycamcontrol")
 
 
 
+def _pick_frame_folder():
+    """Session frames are transient — written once, read back by ffmpeg,
+    then deleted — so keep them on a tmpfs when one is available and
+    spare the SD card the double bandwidth and wear"""
+    override = os.environ.get("MYCAM_FRAME_DIR")
+    if override:
+        return override
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm/mycamcontrol/frames"
+    return os.path.join(WORKSPACE, "frames")
+
+
 LOG_FOLDER = os.path.join(WORKSPACE, "logs")
 VIDEO_FOLDER = os.path.join(WORKSPACE, "videos")
-FRAME_FOLDER = os.path.join(WORKSPACE, "frames")
+FRAME_FOLDER = _pick_frame_folder()
 BACKUP_FOLDER = os.path.join(WORKSPACE, "backups")
+CAPTURE_FOLDER = os.path.join(WORKSPACE, "captures")
 CONFIG_FOLDER = os.path.join(WORKSPACE, "config")
 
 os.makedirs(WORKSPACE, exist_ok=True)
@@ -26,6 +64,7 @@ os.makedirs(LOG_FOLDER, exist_ok=True)
 os.makedirs(VIDEO_FOLDER, exist_ok=True)
 os.makedirs(FRAME_FOLDER, exist_ok=True)
 os.makedirs(BACKUP_FOLDER, exist_ok=True)
+os.makedirs(CAPTURE_FOLDER, exist_ok=True)
 os.makedirs(CONFIG_FOLDER, exist_ok=True)
 
 CONTROL_FILE = os.path.join(CONFIG_FOLDER, "control.json")
@@ -38,40 +77,93 @@ MAX_RETRIES = 3
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
+# Log records are enqueued from the hot path and written by a background
+# thread, so SD-card latency never delays a frame capture
+_log_queue = queue.Queue(-1)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FOLDER + '/app.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
+
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_file_handler = RotatingFileHandler(LOG_FOLDER + '/app.log',
+                                    maxBytes=5_000_000, backupCount=3)
+_file_handler.setFormatter(_log_formatter)
+# File writes land in blocks of 64 records (immediately on ERROR) so a
+# chatty capture loop costs one SD-card write per block, not per record;
+# the console handler stays unbuffered for live tailing
+_buffered_file_handler = MemoryHandler(capacity=64, flushLevel=logging.ERROR,
+                                       target=_file_handler)
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(_log_formatter)
+
+_log_listener = QueueListener(_log_queue, _buffered_file_handler, _stream_handler)
+_log_listener.start()
+# Drain the queue and the MemoryHandler buffer on interpreter exit —
+# the listener thread is a daemon, so without this the final records
+# (shutdown messages included) would be dropped
+atexit.register(_log_listener.stop)
+
 logger = logging.getLogger(__name__)
 
 
-def get_disk_space_mb():
+# path -> (monotonic ts, free MB) — free space barely moves between
+# 100KB frames, no need to statvfs before every capture. Keyed by path
+# because the frame folder may sit on tmpfs while videos and backups
+# live on the persistent card
+_disk_cache = {}
+_DISK_CACHE_TTL = 30
+
+
+def get_disk_space_mb(path=FRAME_FOLDER):
+    hit = _disk_cache.get(path)
+    if hit is not None and time.monotonic() - hit[0] < _DISK_CACHE_TTL:
+        return hit[1]
     try:
-        total, used, free = shutil.disk_usage(".")
-        return free // (1024 * 1024)  # Convert to MB
+        if hasattr(os, 'statvfs'):
+            st = os.statvfs(path)
+            free_mb = (st.f_bavail * st.f_frsize) // (1024 * 1024)
+        else:
+            total, used, free = shutil.disk_usage(path)
+            free_mb = free // (1024 * 1024)  # Convert to MB
+        _disk_cache[path] = (time.monotonic(), free_mb)
+        return free_mb
     except Exception as e:
         logger.error(f"Error getting disk space: {e}")
         return 0
 
 
+# (mtime, data) — the worker loop reads status every few seconds and the
+# file rarely changes; one stat replaces a JSON parse per iteration
+_status_cache = {"mtime": 0, "data": None}
+
+
 def write_status(status):
-    """Write control status"""
+    """Write control status atomically via tmp file + rename"""
     try:
-        with open(CONTROL_FILE, 'w') as f:
-            json.dump(status, f, ensure_ascii=False, indent=2)
+        tmp_path = CONTROL_FILE + ".tmp"
+        data = _dumps(status)
+        # Binary mode: one write of the serialized bytes, no TextIOWrapper
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, CONTROL_FILE)  # readers never see a torn file
+        _status_cache["mtime"] = os.stat(CONTROL_FILE).st_mtime
+        _status_cache["data"] = status
     except Exception as e:
         logger.error(f"Error writing status: {e}")
 
 
 def read_status():
-    """Read control status"""
+    """Read control status (cached until the file changes on disk)"""
     try:
-        with open(CONTROL_FILE, 'r') as f:
-            return json.load(f)
+        mtime = os.stat(CONTROL_FILE).st_mtime
+        if _status_cache["data"] is not None and _status_cache["mtime"] == mtime:
+            return _status_cache["data"]
+        with open(CONTROL_FILE, 'rb') as f:
+            data = _loads(f.read())
+        _status_cache["mtime"] = mtime
+        _status_cache["data"] = data
+        return data
     except Exception as e:
         logger.error(f"Error reading status: {e}")
         return {"status": "stop", "processing": False}
@@ -84,8 +176,8 @@ def read_cam_info():
         return default_res
 
     try:
-        with open(CAM_INFO_FILE, 'r') as f:
-            return json.load(f)
+        with open(CAM_INFO_FILE, 'rb') as f:
+            return _loads(f.read())
     except Exception as e:
         logger.error(f"Error reading cam info: {e}")
         return default_res
@@ -93,16 +185,38 @@ def read_cam_info():
 def write_cam_info(cam_info):
     """Write control status"""
     try:
-        with open(CAM_INFO_FILE, 'w') as f:
-            json.dump(cam_info, f, ensure_ascii=False, indent=2)
+        with open(CAM_INFO_FILE, 'wb') as f:
+            f.write(_dumps(cam_info))
     except Exception as e:
         logger.error(f"Error writing cam info: {e}")
 
 def get_session_frames():
     """Get all frames for current session"""
-    frame_pattern = os.path.join(FRAME_FOLDER, "frame_*.jpg")
-    frame_files = sorted(glob.glob(frame_pattern))
-    return frame_files
+    # scandir yields dirents without a stat per entry; names are
+    # zero-padded so a lexicographic sort is already numeric order
+    with os.scandir(FRAME_FOLDER) as it:
+        names = [e.name for e in it
+                 if e.name.startswith("frame_") and e.name.endswith(".jpg")]
+    names.sort()
+    return [os.path.join(FRAME_FOLDER, n) for n in names]
+
+
+def build_concat_list(frame_files, fps):
+    """Write an ffmpeg concat-demuxer list for the session frames
+
+    Lets ffmpeg consume the frames whatever their numbering, so the
+    copy/delete renumber pass is no longer needed before encoding
+    """
+    list_path = os.path.join(FRAME_FOLDER, "concat.txt")
+    duration = 1.0 / fps if fps else 1.0
+    try:
+        with open(list_path, 'w') as f:
+            for frame_file in frame_files:
+                f.write(f"file '{os.path.abspath(frame_file)}'\nduration {duration}\n")
+        return list_path
+    except Exception as e:
+        logger.error(f"Error writing concat list: {e}")
+        return None
 
 
 def renumber_frames_for_video():
@@ -114,29 +228,17 @@ def renumber_frames_for_video():
         return False
 
     try:
-        # Create temporary directory for renumbered frames
-        temp_dir = os.path.join(FRAME_FOLDER, "temp_renumber")
-
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Renumber frames starting from 1
+        # Two-pass in-place rename: park everything under a temp suffix
+        # first so a target name never collides with a not-yet-moved
+        # source, then strip the suffix. No data is copied at any point
+        renamed = []
         for i, frame_file in enumerate(frame_files, 1):
-            new_name = f"frame_{i:06d}.jpg"
-            new_path = os.path.join(temp_dir, new_name)
-            shutil.copy2(frame_file, new_path)
-
-        # Remove original frames and temp directory
-        for frame_file in frame_files:
-            if os.path.exists(frame_file):
-                os.remove(frame_file)
-
-        # Move renumbered frames back
-        for temp_file in os.listdir(temp_dir):
-            src = os.path.join(temp_dir, temp_file)
-            dst = os.path.join(FRAME_FOLDER, temp_file)
-            shutil.move(src, dst)
+            tmp_path = os.path.join(FRAME_FOLDER, f"frame_{i:06d}.jpg.tmp")
+            os.rename(frame_file, tmp_path)
+            renamed.append(tmp_path)
 
-        os.rmdir(temp_dir)
+        for tmp_path in renamed:
+            os.rename(tmp_path, tmp_path[:-4])
 
         logger.info(f"Renumbered {len(frame_files)} frames for video creation")
         return True
@@ -147,7 +249,12 @@ def renumber_frames_for_video():
 
 def str2dict(xstr):
     try:
-        return json.loads(xstr)
+        # Sniff the first byte: JSON payloads start with '{' (0x7b) or
+        # '[', anything else in a bytes value is msgpack
+        if (msgpack is not None and isinstance(xstr, (bytes, bytearray))
+                and xstr and xstr[:1] not in (b'{', b'[')):
+            return msgpack.unpackb(bytes(xstr), raw=False)
+        return _loads(xstr)
     except Exception as e:
         logger.error(f"Error converting string to json: {e}")
         return {}
\ No newline at end of file
@@ -1,20 +1,58 @@
+import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 from CamHelper import get_cam_config, \
-    invalid_cam_config, get_url, test_rtsp_connection
-from DbHelper import DbHelper, TableNames, ColNames, ActionStatus, FieldNames, ActionType
+    invalid_cam_config, get_url, probe_rtsp_urls, capture_frame_warm, \
+    CHANNEL_1, CHANNEL_2
+from DbHelper import DbHelper, TableNames, ColNames, ActionStatus, FieldNames, ActionType, NOW
 from SysConfig import SysConfig
-from common import logger, str2dict
+from common import logger, str2dict, CAPTURE_FOLDER, _dumps
+
+CHANNELS = (CHANNEL_1, CHANNEL_2)
+CAPTURE_WIDTH = 1920
+CAPTURE_HEIGHT = 1080
 
 sys_config = SysConfig()
 
 running = True
 db = DbHelper()
 db.update_by_sys_config(sys_config)
+db.ensure_action_queue_index()
+
+# Adaptive idle backoff: near-instant pickup right after activity,
+# capped polling cost when the queue stays empty
+_IDLE_DELAY_MIN = 0.2
+_IDLE_DELAY_MAX = 2.0
+_idle_delay = _IDLE_DELAY_MIN
+
+# mac -> (monotonic ts, camera row), filled from the SQL lookup and
+# cleared whenever the fleet is re-upserted; a mostly-static fleet then
+# costs zero SELECTs per action in the steady state. The TTL bounds how
+# long a row edited externally (e.g. a password rotated straight in the
+# DB) can be served stale
+_cam_cache = {}
+_CAM_CACHE_TTL = 60
+
+# mac -> (ip, type) as last pushed to the DB; a config reload that
+# changed nothing then costs zero SQL, and a partial change only
+# upserts the cameras that moved
+_last_cam_state = {}
+
+
+def claim_pending_action():
+    """Read and claim the newest pending action in one DB round trip"""
+    try:
+        return db.claim_next_action()
+    except Exception as e:
+        logger.error(f"Error claiming pending action: {e}")
+        return None
+
 
 def do_worker():
+    global _idle_delay
     try:
         cam_config, is_cached = get_cam_config()
         if invalid_cam_config(cam_config):
@@ -23,39 +61,40 @@ def do_worker():
             return False
 
         if not is_cached:
-            logger.info('force update all cam')
-            data_list = []
-            for cam_item in cam_config['cameras']:
-                data_list.append({
+            changed = [cam_item for cam_item in cam_config['cameras']
+                       if _last_cam_state.get(cam_item['mac'])
+                       != (cam_item['ip'], cam_item['type'])]
+            if changed:
+                logger.info(f'force update {len(changed)} changed cams')
+                # One timestamp for the whole batch — no datetime.now() per row
+                now = datetime.now()
+                data_list = [{
                     ColNames.IP_ADDRESS: cam_item['ip'],
                     ColNames.IP_TYPE: cam_item['type'],
                     ColNames.MAC_ADDRESS: cam_item['mac'],
-                    ColNames.UPDATED_AT: datetime.now()
-                })
-            db.insert_or_update_batch_precise(
-                table=TableNames.CAMERA,
-                data_list=data_list,
-                unique_columns=[ColNames.MAC_ADDRESS],
-                update_columns=[ColNames.IP_ADDRESS, ColNames.UPDATED_AT]
-            )
-
-        action = db.select_first_order_by(table=TableNames.ACTION,
-                                          conditions=f"{ColNames.STATUS} = '{ActionStatus.PENDING}'",
-                                          col_name=ColNames.CREATED_AT,
-                                          sort_type='desc')
+                    ColNames.UPDATED_AT: now
+                } for cam_item in changed]
+                db.insert_or_update_batch_precise(
+                    table=TableNames.CAMERA,
+                    data_list=data_list,
+                    unique_columns=[ColNames.MAC_ADDRESS],
+                    update_columns=[ColNames.IP_ADDRESS, ColNames.UPDATED_AT]
+                )
+                for cam_item in changed:
+                    _last_cam_state[cam_item['mac']] = (cam_item['ip'],
+                                                        cam_item['type'])
+                _cam_cache.clear()
+
+        action = claim_pending_action()
         if not action:
-            time.sleep(2)
+            time.sleep(_idle_delay)
+            _idle_delay = min(_idle_delay * 2, _IDLE_DELAY_MAX)
             return True
-
-        db.update_by_id(table=TableNames.ACTION,
-                        id_value=action[ColNames.ID],
-                        data={ColNames.STATUS: ActionStatus.IN_PROGRESS})
+        _idle_delay = _IDLE_DELAY_MIN
 
         addition = str2dict(action[ColNames.ADDITIONS])
 
         do_action(action, addition)
-
-        time.sleep(3)
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received")
         return False
@@ -65,39 +104,208 @@ def do_worker():
     return True
 
 
+def capture_channel(cam_info, channel, capture_folder):
+    """Capture one still from one camera channel"""
+    ip_address = cam_info[ColNames.IP_ADDRESS]
+    rtsp_url = get_url(ip_address, cam_info[ColNames.USER], cam_info[ColNames.PASSWORD],
+                       channel=channel)
+    output_path = os.path.join(capture_folder, f"{ip_address}_{channel}.jpg")
+    if not capture_frame_warm(rtsp_url, CAPTURE_WIDTH, CAPTURE_HEIGHT, output_path):
+        logger.warning(f"Capture failed for cam {ip_address} channel {channel}")
+        return None
+    return output_path
+
+
+def do_capture_and_stitch(action, cam_infos):
+    """Capture every channel of every camera concurrently, stitch per channel
+
+    RTSP handshakes dominate per-capture latency and cv2/ffmpeg release
+    the GIL, so all captures in flight at once finish in roughly the
+    time of the slowest single stream. A channel's stitch is submitted
+    the moment its last capture lands, so stitching (CPU/GPU) overlaps
+    the other channel's still-running captures (network): wall time
+    approaches max(capture, stitch) instead of their sum
+    """
+    capture_folder = os.path.join(CAPTURE_FOLDER, str(action[ColNames.ID]))
+    os.makedirs(capture_folder, exist_ok=True)
+
+    tasks = [(pos, cam_info, channel)
+             for pos, cam_info in enumerate(cam_infos) for channel in CHANNELS]
+    # One slot per camera position: captures land in stitch order as they
+    # arrive, so no sort is needed before stitching
+    channel_captures = {channel: [None] * len(cam_infos) for channel in CHANNELS}
+    # SoA metadata: three parallel lists instead of a dict per frame;
+    # the per-entry dicts only materialize at JSON-dump time
+    paths, ips, chans = [], [], []
+
+    # A channel needs at least 2 good frames to stitch; once more than
+    # max_failures captures fail, its remaining RTSP attempts are wasted
+    max_failures = max(0, len(cam_infos) - 2)
+    failed = {channel: 0 for channel in CHANNELS}
+    remaining = {channel: len(cam_infos) for channel in CHANNELS}
+    stitch_futures = {}
+
+    with ThreadPoolExecutor(max_workers=len(CHANNELS)) as stitch_pool:
+        with ThreadPoolExecutor(max_workers=min(32, len(tasks))) as capture_pool:
+            futures = {capture_pool.submit(capture_channel, cam_info, channel,
+                                           capture_folder):
+                       (pos, cam_info, channel) for pos, cam_info, channel in tasks}
+            for future in as_completed(futures):
+                pos, cam_info, channel = futures[future]
+                remaining[channel] -= 1
+                if future.cancelled():
+                    frame_path = None
+                else:
+                    try:
+                        frame_path = future.result()
+                    except Exception as e:
+                        logger.error(f"Capture error for cam "
+                                     f"{cam_info[ColNames.IP_ADDRESS]} "
+                                     f"channel {channel}: {e}")
+                        frame_path = None
+                if frame_path:
+                    channel_captures[channel][pos] = frame_path
+                    paths.append(frame_path)
+                    ips.append(cam_info[ColNames.IP_ADDRESS])
+                    chans.append(channel)
+                elif not future.cancelled():
+                    failed[channel] += 1
+                    if failed[channel] > max_failures:
+                        logger.warning(f"Channel {channel} cannot stitch anymore, "
+                                       f"cancelling its pending captures")
+                        for other, (_, _, other_channel) in futures.items():
+                            if other_channel == channel:
+                                other.cancel()
+                if remaining[channel] == 0:
+                    files = [p for p in channel_captures[channel] if p]
+                    if len(files) < 2:
+                        logger.warning(f"Not enough captures to stitch "
+                                       f"channel {channel}")
+                    else:
+                        stitch_futures[channel] = stitch_pool.submit(
+                            stitch_channel, channel, files, capture_folder)
+
+        write_capture_metadata(capture_folder, paths, ips, chans)
+
+        stitched_any = False
+        for channel, future in stitch_futures.items():
+            try:
+                if future.result():
+                    stitched_any = True
+            except Exception as e:
+                logger.error(f"Stitch error for channel {channel}: {e}")
+
+    return ActionStatus.DONE if stitched_any else ActionStatus.FAILED
+
+
+def write_capture_metadata(capture_folder, paths, ips, chans):
+    """Persist the session capture metadata from the parallel lists"""
+    metadata_path = os.path.join(capture_folder, "metadata.json")
+    try:
+        entries = [{'path': paths[i], 'ip': ips[i], 'channel': chans[i]}
+                   for i in range(len(paths))]
+        # Binary mode: one write of the serialized bytes, no TextIOWrapper
+        with open(metadata_path, 'wb') as f:
+            f.write(_dumps(entries))
+    except Exception as e:
+        logger.error(f"Error writing capture metadata: {e}")
+
+
+def stitch_channel(channel, files, capture_folder):
+    """Stitch one channel and write its panorama on the worker thread
+
+    Encoding inside the thread lets channel A's encode overlap channel
+    B's stitch
+    """
+    # Lazy import: the stitch pipeline is only paid for when a stitch
+    # action actually runs, keeping the plain worker's startup light
+    from StitchHelper import stitch_images, write_panorama
+    stitched = stitch_images(files)
+    if stitched is None:
+        logger.error(f"Stitching failed for channel {channel}")
+        return False
+    stitched_path = os.path.join(capture_folder, f"stitched_{channel}.jpg")
+    if write_panorama(stitched, stitched_path):
+        logger.info(f"Stitched channel {channel} -> {stitched_path}")
+        return True
+    logger.error(f"Failed to write panorama for channel {channel}")
+    return False
+
+
+def do_check_config(action, cam_infos):
+    """Probe every camera channel's RTSP endpoint concurrently
+
+    A bare OPTIONS round trip per URL replaces the serialized ffmpeg
+    handshakes — the probes share one event loop, so the whole fleet
+    answers in roughly the slowest single RTT. Duplicate URLs across
+    rows are probed once
+    """
+    urls = []
+    for cam_info in cam_infos:
+        for channel in CHANNELS:
+            rtsp_url = get_url(cam_info[ColNames.IP_ADDRESS],
+                               cam_info[ColNames.USER],
+                               cam_info[ColNames.PASSWORD],
+                               channel=channel)
+            if rtsp_url not in urls:
+                urls.append(rtsp_url)
+    results = probe_rtsp_urls(urls)
+    for rtsp_url, is_working in results.items():
+        if is_working:
+            logger.info(f"this cam with url {rtsp_url} is working")
+        else:
+            logger.warning(f"this cam with url {rtsp_url} is not reachable")
+    return ActionStatus.DONE if all(results.values()) else ActionStatus.FAILED
+
+
+# One handler per command: dispatch is a dict lookup, and adding a new
+# ActionType never touches do_action
+COMMAND_HANDLERS = {
+    ActionType.CHECK_CONFIG: do_check_config,
+    ActionType.CAPTURE_AND_STITCH: do_capture_and_stitch,
+}
+
+
 def do_action(action, addition):
     action_status = ActionStatus.DONE
     try:
         command = action[ColNames.COMMAND]
         if FieldNames.MAC_ADDRESSES in addition:
             mac_addresses = addition[FieldNames.MAC_ADDRESSES]
-            joined_macs = "', '".join(mac_addresses)
-            final_string = "'" + joined_macs + "'"
-            cam_infos = db.select_all(table=TableNames.CAMERA,
-                                     conditions=f"{ColNames.MAC_ADDRESS} IN ({final_string})")
+            now = time.monotonic()
+            cam_infos = [hit[1] for hit in (_cam_cache.get(mac) for mac in mac_addresses)
+                         if hit is not None and now - hit[0] < _CAM_CACHE_TTL]
+            if len(cam_infos) != len(mac_addresses):
+                # Cache miss: hit the DB, then remember the rows for the
+                # next action on the same cameras.
+                # Placeholders keep the query text stable per MAC count, so
+                # the driver/server can reuse the parse — and nothing
+                # user-supplied is spliced into the SQL
+                placeholders = ", ".join(["%s"] * len(mac_addresses))
+                cam_infos = db.select_all(table=TableNames.CAMERA,
+                                         conditions=f"{ColNames.MAC_ADDRESS} IN ({placeholders})",
+                                         params=tuple(mac_addresses))
+                for cam_info in cam_infos:
+                    _cam_cache[cam_info[ColNames.MAC_ADDRESS]] = (now, cam_info)
         else:
             logger.warning('no camera choose')
             action_status = ActionStatus.FAILED
             return
 
         if not cam_infos:
-            logger.warning(f"not found cameras for macs: {final_string}")
+            logger.warning(f"not found cameras for macs: {mac_addresses}")
             action_status = ActionStatus.FAILED
             return
 
-        logger.info(f"found {len(cam_infos)} cameras for macs: {final_string}")
+        logger.info(f"found {len(cam_infos)} cameras for macs: {mac_addresses}")
 
-        for cam_info in cam_infos:
-            ip_address = cam_info[ColNames.IP_ADDRESS]
-            user = cam_info[ColNames.USER]
-            password = cam_info[ColNames.PASSWORD]
-            logger.info(f"do command {command}, with cam IP {ip_address} here")
-            if command == ActionType.CHECK_CONFIG:
-                rtsp_url = get_url(ip_address, user, password)
-                if test_rtsp_connection(rtsp_url):
-                    action_status = ActionStatus.DONE
-                    logger.info(f"this cam with url {rtsp_url} is working")
+        handler = COMMAND_HANDLERS.get(command)
+        if handler is None:
+            logger.warning(f"no handler for command {command}")
+            action_status = ActionStatus.FAILED
+            return
 
+        action_status = handler(action, cam_infos)
 
     finally:
         logger.info(f"finally update action {action[ColNames.ID]} to {action_status}")
@@ -105,7 +313,7 @@ def do_action(action, addition):
                         id_value=action[ColNames.ID],
                         data={
                             ColNames.STATUS: action_status,
-                            ColNames.UPDATED_AT: datetime.now()
+                            ColNames.UPDATED_AT: NOW
                         })
 
 try: